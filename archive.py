@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from itertools import repeat
+import aiosqlite
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+# Страниц на одну транзакцию инкрементальной очистки: писатель занят десятки миллисекунд
+VACUUM_STEP_PAGES = 1000
+# PRAGMA auto_vacuum: 2 — INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+# Переносимые колонки; в архиве они те же, id сохраняются, чтобы отчёты не путались при чтении
+ARCHIVED_COLUMNS = {
+    "reports": "id, user_id, full_name, photo_id, report_text, report_date, status, reviewer_id, claimed_at",
+    "notifications": "id, user_id, message, is_read, created_at, status, attempts, next_attempt_at",
+}
+# Схема архива повторяет колонки рабочих таблиц без ограничений и значений по умолчанию
+ARCHIVE_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS archive.reports (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        full_name TEXT NOT NULL,
+        photo_id TEXT,
+        report_text TEXT,
+        report_date TEXT NOT NULL,
+        status TEXT NOT NULL,
+        reviewer_id INTEGER,
+        claimed_at REAL
+    )""",
+    "CREATE INDEX IF NOT EXISTS archive.idx_reports_period ON reports (report_date, id)",
+    """CREATE TABLE IF NOT EXISTS archive.notifications (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        message TEXT NOT NULL,
+        is_read BOOLEAN,
+        created_at TEXT,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL,
+        next_attempt_at REAL NOT NULL
+    )""",
+)
+
+
+@asynccontextmanager
+async def attached(db: aiosqlite.Connection, path: str):
+    """Подключает файл архива к соединению как схему archive на время блока"""
+    # ATTACH и DETACH нельзя выполнять внутри транзакции
+    await db.execute("ATTACH DATABASE ? AS archive", (path,))
+    try:
+        yield db
+    finally:
+        # Блок прерван посреди транзакции: без отката DETACH не пройдёт и архив останется подключённым
+        if db.in_transaction:
+            await db.rollback()
+        await db.execute("DETACH DATABASE archive")
+
+
+async def create_schema(db: aiosqlite.Connection):
+    """Создаёт таблицы в подключённом архиве"""
+    for statement in ARCHIVE_SCHEMA:
+        await db.execute(statement)
+
+
+async def reaches_archive(db: aiosqlite.Connection, table_name: str, start_date: str) -> bool:
+    """Попадает ли период, начинающийся с start_date, в уже перенесённые в архив строки"""
+    async with db.execute(
+        "SELECT archived_before FROM archive_state WHERE table_name = ?", (table_name,)
+    ) as cursor:
+        row = await cursor.fetchone()
+    return row is not None and start_date < row[0]
+
+
+async def _prepare(database: Database, path: str, table_name: str, archived_before: str):
+    """Создаёт архив и сдвигает границу до переноса, чтобы читатели сразу заглядывали в архив"""
+    async with database.write() as db:
+        async with attached(db, path):
+            await db.execute("PRAGMA archive.journal_mode = WAL")
+            await create_schema(db)
+            await db.execute(
+                """INSERT INTO archive_state (table_name, archived_before) VALUES (?, ?)
+                ON CONFLICT(table_name) DO UPDATE SET
+                    archived_before = MAX(archived_before, excluded.archived_before)""",
+                (table_name, archived_before)
+            )
+            await db.commit()
+
+
+async def _move(db: aiosqlite.Connection, table_name: str, ids: list):
+    """Переносит строки в подключённый архив: сначала фиксируется копия, затем удаление из рабочей базы"""
+    columns = ARCHIVED_COLUMNS[table_name]
+    ids_json = json.dumps(ids)
+    # Транзакция на два файла в режиме WAL не атомарна. Поэтому копия фиксируется отдельно,
+    # а читатели берут из архива только строки, которых уже нет в рабочей таблице
+    await db.execute(
+        f"""INSERT OR REPLACE INTO archive.{table_name} ({columns})
+        SELECT {columns} FROM main.{table_name} WHERE id IN (SELECT value FROM json_each(?))""",
+        (ids_json,)
+    )
+    await db.commit()
+    await db.execute(f"DELETE FROM main.{table_name} WHERE id IN (SELECT value FROM json_each(?))", (ids_json,))
+    await db.commit()
+
+
+async def archive_reports(database: Database, path: str, before: str, batch_size: int = BATCH_SIZE) -> int:
+    """Переносит в архив проверенные отчёты с датой раньше before, пакетами по batch_size"""
+    await _prepare(database, path, "reports", before)
+    total = 0
+    while True:
+        async with database.write() as db:
+            # Непроверенные отчёты остаются в рабочей базе: их ждёт очередь проверки.
+            # Даты в старом формате ДД.ММ.ГГГГ сравниваются неверно, их сначала переводит миграция
+            async with db.execute(
+                """SELECT id FROM reports
+                WHERE report_date < ? AND status != 'На проверке' AND report_date NOT LIKE '__.__.____'
+                ORDER BY report_date, id
+                LIMIT ?""",
+                (before, batch_size)
+            ) as cursor:
+                ids = [row[0] for row in await cursor.fetchall()]
+            if not ids:
+                break
+            async with attached(db, path):
+                await _move(db, "reports", ids)
+        total += len(ids)
+        # Между пакетами писатель свободен для обработчиков
+        await asyncio.sleep(0)
+    logger.info(f"Archived {total} reports older than {before}")
+    return total
+
+
+async def archive_notifications(database: Database, path: str, before: str, batch_size: int = BATCH_SIZE) -> int:
+    """Переносит в архив доставленные и недоставленные уведомления, созданные раньше before"""
+    await _prepare(database, path, "notifications", before)
+    total = 0
+    after = 0
+    finished = False
+    while not finished:
+        async with database.write() as db:
+            # created_at растёт вместе с id, поэтому обход по первичному ключу останавливается на первом новом
+            async with db.execute(
+                "SELECT id, created_at, status FROM notifications WHERE id > ? ORDER BY id LIMIT ?",
+                (after, batch_size)
+            ) as cursor:
+                rows = await cursor.fetchall()
+            finished = len(rows) < batch_size
+            ids = []
+            for notification_id, created_at, status in rows:
+                if created_at is None or created_at >= before:
+                    finished = True
+                    break
+                after = notification_id
+                # Ожидающие отправки уведомления остаются в очереди outbox
+                if status != "pending":
+                    ids.append(notification_id)
+            if ids:
+                async with attached(db, path):
+                    await _move(db, "notifications", ids)
+        total += len(ids)
+        await asyncio.sleep(0)
+    logger.info(f"Archived {total} notifications older than {before}")
+    return total
+
+
+async def incremental_vacuum(database: Database, step_pages: int = VACUUM_STEP_PAGES) -> int:
+    """Возвращает освободившиеся после переноса страницы файловой системе короткими транзакциями"""
+    async with database.read() as db:
+        async with db.execute("PRAGMA auto_vacuum") as cursor:
+            mode = (await cursor.fetchone())[0]
+    if mode != AUTO_VACUUM_INCREMENTAL:
+        logger.info("auto_vacuum is not incremental, freed pages are reused by new rows; "
+                    "run `python migrations.py vacuum` once to shrink the file")
+        return 0
+
+    released = 0
+    while True:
+        async with database.write() as db:
+            async with db.execute("PRAGMA freelist_count") as cursor:
+                free = (await cursor.fetchone())[0]
+            if not free:
+                break
+            pages = min(free, step_pages)
+            # Каждый шаг выполнения incremental_vacuum освобождает одну страницу, а execute делает один шаг
+            await db.execute("BEGIN")
+            await db.executemany("PRAGMA incremental_vacuum(1)", repeat((), pages))
+        released += pages
+        await asyncio.sleep(0)
+    if released:
+        logger.info(f"Incremental vacuum released {released} pages")
+    return released
@@ -0,0 +1,68 @@
+"""Назначение задачи группе: по одному сотруднику за раз против одной транзакции на всех.
+
+Запуск: python benchmarks/bulk_assign.py [число сотрудников ...]
+Измеряется запись задач и постановка уведомлений в outbox; сама рассылка
+в обоих случаях идёт через одну и ту же фоновую очередь с лимитами Telegram.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARKBENCHMARKBENCHMARKBENCHMA")
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+import bot as app
+
+DEFAULT_SIZES = (200, 1000, 5000)
+POSITIONS = ("Инженер", "Менеджер", "Прораб", "Снабженец")
+
+
+async def seed(count: int) -> list:
+    async with app.database.write() as db:
+        await db.execute("DELETE FROM users")
+        await db.executemany(
+            "INSERT INTO users (user_id, full_name, search_name, position) VALUES (?, ?, ?, ?)",
+            [
+                (user_id, f"Сотрудник {user_id}", f"сотрудник {user_id}", POSITIONS[user_id % len(POSITIONS)])
+                for user_id in range(1, count + 1)
+            ]
+        )
+    return list(range(1, count + 1))
+
+
+async def timed(coro) -> float:
+    started = time.perf_counter()
+    await coro
+    return time.perf_counter() - started
+
+
+async def one_at_a_time(user_ids: list):
+    """Прежний путь: отдельная транзакция на каждого сотрудника"""
+    for user_id in user_ids:
+        await app.create_tasks("📋 Основная Задача", "Проверить объект", user_ids=[user_id])
+
+
+async def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    await app.database.connect()
+    try:
+        await app.init_db()
+        print(f"{'users':>6} {'one by one':>12} {'bulk (ids)':>12} {'bulk (all)':>12} {'bulk (groups)':>14}")
+        for count in sizes:
+            user_ids = await seed(count)
+            single = await timed(one_at_a_time(user_ids))
+            bulk_ids = await timed(app.create_tasks("📋 Основная Задача", "Проверить объект", user_ids=user_ids))
+            bulk_all = await timed(app.create_tasks("📋 Основная Задача", "Проверить объект", everyone=True))
+            bulk_groups = await timed(app.create_tasks("📋 Основная Задача", "Проверить объект", positions=POSITIONS))
+            print(f"{count:>6} {single * 1000:>10.1f}ms {bulk_ids * 1000:>10.1f}ms "
+                  f"{bulk_all * 1000:>10.1f}ms {bulk_groups * 1000:>12.1f}ms")
+    finally:
+        await app.database.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""Планировщик сроков задач на большом числе открытых задач: загрузка, память, простой и срабатывание.
+
+Запуск: python benchmarks/deadline_scheduler.py [открытых задач] [различных сроков]
+Сроки равномерно распределены по ближайшим 30 дням; задачи, назначенные пакетом,
+делят один срок, поэтому число различных сроков обычно много меньше числа задач.
+Каждый замер идёт в отдельном процессе, чтобы память одного не влияла на другой.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import deadlines
+from database import Database
+from migrations import apply_migrations
+
+USERS = 1000
+BURST = 10_000
+IDLE_SECONDS = 3
+
+
+async def seed(database: Database, tasks: int, distinct: int):
+    start = datetime.now().replace(second=0, microsecond=0) + timedelta(days=1)
+    step = timedelta(days=30) / distinct
+    due = [(start + step * i).strftime(deadlines.DEADLINE_FORMAT) for i in range(distinct)]
+    async with database.write() as db:
+        await db.executemany(
+            "INSERT INTO users (user_id, full_name, search_name) VALUES (?, ?, ?)",
+            [(user_id, f"Сотрудник {user_id}", f"сотрудник {user_id}") for user_id in range(1, USERS + 1)]
+        )
+        await db.executemany(
+            """INSERT INTO tasks (user_id, task_type, task_text, task_date, deadline, status)
+            VALUES (?, ?, ?, ?, ?, ?)""",
+            [(i % USERS + 1, "📋 Основная Задача", f"Задача {i % distinct}", start.strftime("%Y-%m-%d"),
+              due[i % distinct], "Новая") for i in range(tasks)]
+        )
+
+
+async def run(tasks: int, distinct: int):
+    database = Database(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    await database.connect()
+    try:
+        await apply_migrations(database)
+        await seed(database, tasks, distinct)
+        scheduler = deadlines.DeadlineScheduler(database, [1], remind_before=3 * 3600)
+
+        started = time.perf_counter()
+        await scheduler.load()
+        load_time = time.perf_counter() - started
+        # Память меряется повторной загрузкой: под tracemalloc время было бы завышено
+        scheduler = deadlines.DeadlineScheduler(database, [1], remind_before=3 * 3600)
+        tracemalloc.start()
+        await scheduler.load()
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        # Простой: цикл спит до срока через сутки, процессорное время не тратится
+        loop_task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.5)
+        cpu = time.process_time()
+        await asyncio.sleep(IDLE_SECONDS)
+        idle_cpu = (time.process_time() - cpu) / IDLE_SECONDS
+
+        # Срабатывание: пачка задач с уже наступившим сроком
+        async with database.write() as db:
+            past = (datetime.now() - timedelta(minutes=1)).strftime(deadlines.DEADLINE_FORMAT)
+            await db.executemany(
+                """INSERT INTO tasks (user_id, task_type, task_text, task_date, deadline, status)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                [(i % USERS + 1, "📋 Основная Задача", "Срочная", past[:10], past, "Новая") for i in range(BURST)]
+            )
+            async with db.execute("SELECT id FROM tasks ORDER BY id DESC LIMIT ?", (BURST,)) as cursor:
+                burst_ids = [task_id for task_id, in await cursor.fetchall()]
+        started = time.perf_counter()
+        scheduler.add(burst_ids, past)
+        while True:
+            async with database.read() as db:
+                async with db.execute(
+                    "SELECT COUNT(*) FROM notifications WHERE status = 'pending' AND next_attempt_at <= ?",
+                    (time.time(),)
+                ) as cursor:
+                    if (await cursor.fetchone())[0] >= BURST:
+                        break
+            await asyncio.sleep(0.01)
+        fire_time = time.perf_counter() - started
+
+        loop_task.cancel()
+        await asyncio.gather(loop_task, return_exceptions=True)
+    finally:
+        await database.close()
+
+    print(f"{tasks:>8} {distinct:>8}  load {load_time * 1000:7.1f}ms  "
+          f"heap+groups {retained / 1024 / 1024:6.2f}MiB  idle CPU {idle_cpu:6.2%}  "
+          f"fire {BURST} overdue {fire_time * 1000:7.1f}ms")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        asyncio.run(run(int(sys.argv[2]), int(sys.argv[3])))
+        return
+
+    tasks = sys.argv[1] if len(sys.argv) > 1 else "100000"
+    cases = [sys.argv[2]] if len(sys.argv) > 2 else ["100", "5000", tasks]
+    print(f"{'tasks':>8} {'deadlines':>8}")
+    for distinct in cases:
+        subprocess.run([sys.executable, __file__, "--run", tasks, distinct], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Пиковая память выгрузки отчетов в файл в зависимости от размера периода.
+
+Запуск: python benchmarks/export_memory.py [число строк ...]
+Каждый размер измеряется в отдельном процессе, чтобы пики не накладывались.
+Память Python считается через tracemalloc; кэш страниц SQLite ограничен PRAGMA cache_size.
+"""
+import asyncio
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import export
+from database import Database
+from migrations import apply_migrations
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+START_DATE = date(2024, 1, 1)
+REPORT_TEXT = "Выполнены работы по объекту, замечаний нет. " * 2
+
+
+def seed(path: str, rows: int):
+    """Заполняет базу отчётами равномерно по дням, без участия бота"""
+    days = max(rows // 1000, 1)
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO reports (user_id, full_name, report_date, report_text, status) VALUES (?, ?, ?, ?, ?)",
+            (
+                (i % 1000, f"Сотрудник {i % 1000}",
+                 (START_DATE + timedelta(days=i % days)).isoformat(), REPORT_TEXT, "Принят")
+                for i in range(rows)
+            )
+        )
+    return (START_DATE + timedelta(days=days - 1)).isoformat()
+
+
+async def measure(rows: int, file_format: str):
+    tmp = tempfile.mkdtemp()
+    database = Database(os.path.join(tmp, "bench.db"), readers=1)
+    await database.connect()
+    try:
+        await apply_migrations(database)
+        end_date = seed(database.path, rows)
+
+        started = time.perf_counter()
+        path, exported = await export.export_reports(database, START_DATE.isoformat(), end_date, file_format)
+        elapsed = time.perf_counter() - started
+        size = os.path.getsize(path)
+        os.remove(path)
+
+        # Второй проход под tracemalloc: трассировка сильно замедляет код и не должна портить время
+        tracemalloc.start()
+        path, _ = await export.export_reports(database, START_DATE.isoformat(), end_date, file_format)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        os.remove(path)
+    finally:
+        await database.close()
+        shutil.rmtree(tmp)
+    assert exported == rows, (exported, rows)
+    print(f"{file_format:>4} {rows:>9} rows  {elapsed:7.2f}s  file {size / 2**20:8.1f} MiB  "
+          f"peak python heap {peak / 2**20:6.2f} MiB")
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--run":
+        asyncio.run(measure(int(sys.argv[2]), sys.argv[3]))
+        return
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    for file_format in export.FORMATS:
+        for rows in sizes:
+            subprocess.run([sys.executable, __file__, "--run", str(rows), file_format], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import asyncio
+import itertools
+import json
+import time
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bot", "username": "test_bot"}
+
+
+class FakeBotAPI:
+    """Локальная заглушка Telegram Bot API для бенчмарков без сети"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.updates = asyncio.Queue()
+        self.requests = []
+        self.listeners = []
+        self._message_ids = itertools.count(1)
+        self._update_ids = itertools.count(1)
+        self._runner = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> str:
+        # Видео из MEDIA_FILES загружаются целиком, лимит тела запроса как у Bot API (50 МБ)
+        app = web.Application(client_max_size=50 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.base_url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def attach(self, bot: Bot):
+        """Направляет запросы бота в заглушку, сохраняя middleware прежней сессии"""
+        session = AiohttpSession(api=TelegramAPIServer.from_base(self.base_url))
+        for middleware in bot.session.middleware:
+            session.middleware(middleware)
+        bot.session = session
+
+    # === Обновления ===
+    def make_message_update(self, user_id: int, text: str) -> dict:
+        update = {
+            "update_id": next(self._update_ids),
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"},
+                "text": text,
+            },
+        }
+        if text.startswith("/"):
+            command = text.split()[0]
+            update["message"]["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        return update
+
+    def make_photo_update(self, user_id: int) -> dict:
+        update = self.make_message_update(user_id, "")
+        message = update["message"]
+        del message["text"]
+        message["photo"] = [{"file_id": "photo", "file_unique_id": "photo", "width": 90, "height": 90}]
+        return update
+
+    def make_callback_update(self, user_id: int, data: str, message_id: int = 1) -> dict:
+        return {
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._update_ids)),
+                "chat_instance": str(user_id),
+                "from": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"},
+                "data": data,
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "text": "",
+                },
+            },
+        }
+
+    def push_update(self, update: dict):
+        """Добавляет обновление в очередь getUpdates"""
+        self.updates.put_nowait(update)
+
+    # === Ответы Bot API ===
+    def _message(self, payload: dict, **extra) -> dict:
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(payload.get("chat_id", 0)), "type": "private"},
+            "from": BOT_USER,
+        }
+        if "text" in payload:
+            message["text"] = payload["text"]
+        if "caption" in payload:
+            message["caption"] = payload["caption"]
+        message.update(extra)
+        return message
+
+    async def _get_updates(self, payload: dict) -> list:
+        timeout = float(payload.get("timeout", 0))
+        updates = []
+        try:
+            updates.append(await asyncio.wait_for(self.updates.get(), timeout or 0.01))
+        except asyncio.TimeoutError:
+            return updates
+        while not self.updates.empty() and len(updates) < 100:
+            updates.append(self.updates.get_nowait())
+        return updates
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        payload = dict(await request.post())
+        for key, value in payload.items():
+            # Файлы и вложенные объекты приходят как multipart-части или JSON-строки
+            if isinstance(value, web.FileField):
+                payload[key] = value.filename
+        received = time.perf_counter()
+        self.requests.append((method, payload, received))
+
+        name = method.lower()
+        if name == "getme":
+            result = BOT_USER
+        elif name == "getupdates":
+            result = await self._get_updates(payload)
+        elif name in ("sendmessage", "editmessagetext"):
+            result = self._message(payload)
+        elif name == "sendvideo":
+            file_id = f"video-{next(self._message_ids)}"
+            result = self._message(payload, video={
+                "file_id": file_id, "file_unique_id": file_id, "width": 640, "height": 360, "duration": 5,
+            })
+        elif name == "sendphoto":
+            file_id = f"photo-{next(self._message_ids)}"
+            result = self._message(payload, photo=[{
+                "file_id": file_id, "file_unique_id": file_id, "width": 640, "height": 360,
+            }])
+        elif name == "senddocument":
+            file_id = f"document-{next(self._message_ids)}"
+            result = self._message(payload, document={"file_id": file_id, "file_unique_id": file_id})
+        else:
+            result = True
+
+        for listener in self.listeners:
+            listener(name, payload, received)
+        return web.json_response({"ok": True, "result": result}, dumps=json.dumps)
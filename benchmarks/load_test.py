@@ -0,0 +1,182 @@
+"""Нагрузочный тест бота без сети: заглушка Bot API, заполненная база и сценарии пользователей.
+
+Запуск: python benchmarks/load_test.py [--users 1000] [--reports 20000] [--tasks 5000]
+                                      [--concurrency 20] [--duration 10] [--seed 1]
+Виртуальные пользователи параллельно проходят сценарии (отправка отчёта, личный кабинет,
+проверка отчётов, рейтинг и др.); каждое обновление передаётся диспетчеру, ответы бота
+уходят в заглушку по HTTP. Итог: пропускная способность, p50/p95/p99 по сценариям и доля
+времени, проведённого в SQLite и в запросах к Bot API.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_bot_api import FakeBotAPI
+
+ADMIN_IDS = tuple(range(900_000_001, 900_000_006))
+FIRST_USER_ID = 1_000_000
+
+# Сценарии: (роль, шаги, вес); шаг — текст сообщения или None для фото
+FLOWS = {
+    "report": ("employee", ["📝 Отправить Отчет", None, "Выполнены работы по объекту"], 3),
+    "cabinet": ("employee", ["👤 Личный Кабинет"], 2),
+    "my_reports": ("employee", ["📊 Мои Отчеты"], 2),
+    "my_tasks": ("employee", ["📌 Мои Задачи"], 2),
+    "review": ("admin", ["✅ Проверить Отчеты", "✅ Принять", "✅ Принять", "🔙 Назад"], 1),
+    "rating": ("admin", ["🏆 Рейтинг Сотрудников"], 1),
+}
+
+
+def configure_environment():
+    os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARKBENCHMARKBENCHMARKBENCHMA")
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "load.db")
+    os.environ["LOG_FILE"] = os.path.join(tempfile.mkdtemp(), "load.log")
+    os.environ["ADMINS"] = ",".join(map(str, ADMIN_IDS))
+    os.environ.pop("WEBHOOK_URL", None)
+    # Заглушка не ограничивает частоту запросов; лимиты Telegram можно вернуть через окружение
+    os.environ.setdefault("BROADCAST_RATE", "100000")
+    os.environ.setdefault("BROADCAST_CHAT_RATE", "100000")
+
+
+async def seed(app, users: int, reports: int, tasks: int, rng: random.Random):
+    """Сотрудники, отчёты за последние 8 недель (часть текущей недели на проверке) и задачи"""
+    today = date.today()
+    week_start = today - timedelta(days=today.weekday())
+    user_ids = list(range(FIRST_USER_ID, FIRST_USER_ID + users))
+
+    def report_row(i):
+        user_id = rng.choice(user_ids)
+        if i % 3 == 0:
+            report_date, status = week_start + timedelta(days=rng.randint(0, today.weekday())), "На проверке"
+        else:
+            report_date, status = today - timedelta(days=rng.randint(0, 55)), rng.choice(("Принят", "На доработке"))
+        return user_id, f"Сотрудник {user_id}", "photo", "Отчёт", report_date.isoformat(), status
+
+    async with app.database.write() as db:
+        await db.executemany(
+            "INSERT INTO users (user_id, full_name, search_name, position) VALUES (?, ?, ?, ?)",
+            [(user_id, f"Сотрудник {user_id}", f"сотрудник {user_id}", rng.choice(("Инженер", "Прораб")))
+             for user_id in user_ids]
+        )
+        await db.executemany(
+            """INSERT INTO reports (user_id, full_name, photo_id, report_text, report_date, status)
+            VALUES (?, ?, ?, ?, ?, ?)""",
+            [report_row(i) for i in range(reports)]
+        )
+        await db.executemany(
+            "INSERT INTO tasks (user_id, task_type, task_text, task_date, status) VALUES (?, ?, ?, ?, ?)",
+            [(rng.choice(user_ids), "📋 Основная Задача", "Задача", today.isoformat(), "Новая")
+             for _ in range(tasks)]
+        )
+    await app.stats.rebuild_user_stats(app.database)
+    return user_ids
+
+
+def percentile(values: list, q: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] if len(values) > 1 else values[0]
+
+
+async def run(args):
+    configure_environment()
+    import bot as app
+    import metrics
+
+    rng = random.Random(args.seed)
+    api = FakeBotAPI()
+    await api.start()
+    api.attach(app.bot)
+    await app.on_startup()
+
+    try:
+        started = time.perf_counter()
+        user_ids = await seed(app, args.users, args.reports, args.tasks, rng)
+        print(f"Seeded {args.users} users, {args.reports} reports, {args.tasks} tasks "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        # Один виртуальный пользователь не проходит два сценария одновременно
+        pools = {"employee": asyncio.Queue(), "admin": asyncio.Queue()}
+        for user_id in rng.sample(user_ids, len(user_ids)):
+            pools["employee"].put_nowait(user_id)
+        for admin_id in ADMIN_IDS:
+            pools["admin"].put_nowait(admin_id)
+
+        names = list(FLOWS)
+        weights = [FLOWS[name][2] for name in names]
+        latencies = {name: [] for name in names}
+        update_time = 0.0
+        updates = 0
+        db_before = sum(total for _, total in metrics.DB_SECONDS.summary().values())
+        api_before = sum(total for _, total in metrics.API_SECONDS.summary().values())
+        deadline = time.perf_counter() + args.duration
+
+        async def worker():
+            nonlocal update_time, updates
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                role, steps, _ = FLOWS[name]
+                user_id = await pools[role].get()
+                try:
+                    flow_started = time.perf_counter()
+                    for step in steps:
+                        if step is None:
+                            update = api.make_photo_update(user_id)
+                        else:
+                            update = api.make_message_update(user_id, step)
+                        step_started = time.perf_counter()
+                        await app.dp.feed_raw_update(app.bot, update)
+                        update_time += time.perf_counter() - step_started
+                        updates += 1
+                    latencies[name].append((time.perf_counter() - flow_started) * 1000)
+                finally:
+                    pools[role].put_nowait(user_id)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        db_time = sum(total for _, total in metrics.DB_SECONDS.summary().values()) - db_before
+        api_time = sum(total for _, total in metrics.API_SECONDS.summary().values()) - api_before
+    finally:
+        await app.on_shutdown()
+        await app.bot.session.close()
+        await api.stop()
+
+    flows = sum(len(values) for values in latencies.values())
+    print(f"\nconcurrency={args.concurrency} duration={elapsed:.1f}s "
+          f"flows={flows} ({flows / elapsed:.1f}/s) updates={updates} ({updates / elapsed:.1f}/s)")
+    print(f"{'flow':<12}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, values in latencies.items():
+        if values:
+            print(f"{name:<12}{len(values):>7}{percentile(values, 50):>10.1f}"
+                  f"{percentile(values, 95):>10.1f}{percentile(values, 99):>10.1f}")
+    print(f"\nDB time share:  {db_time / update_time:6.1%} of update processing time")
+    print(f"API time share: {api_time / update_time:6.1%} of update processing time")
+    print(f"Other (Python code, waiting for the event loop): {1 - (db_time + api_time) / update_time:6.1%}")
+
+    top = sorted(metrics.DB_SECONDS.summary().items(), key=lambda item: item[1][1], reverse=True)[:8]
+    print("\nTop DB operations by total time:")
+    for operation, (count, total) in top:
+        print(f"  {operation:<40}{count:>8}  {total * 1000:9.1f}ms  {total / count * 1000:7.3f}ms avg")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--reports", type=int, default=20000)
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
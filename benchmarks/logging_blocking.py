@@ -0,0 +1,115 @@
+"""Сколько времени логирование отнимает у цикла событий: FileHandler в потоке цикла против очереди.
+
+Запуск: python benchmarks/logging_blocking.py [записей в секунду] [секунд]
+Нагрузка — равномерный поток записей от многих корутин, как от обработчиков обновлений.
+Сценарий «медленный диск» задерживает каждую сотую запись в файл на 20 мс
+(так выглядит запись в лог на перегруженном или сетевом томе).
+Каждый замер идёт в отдельном процессе; вывод в консоль уходит в /dev/null.
+"""
+import asyncio
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from logging_setup import TEXT_FORMAT, setup_logging
+
+MODES = ("direct", "queue", "queue+sampling")
+WRITERS = 50
+STALL_EVERY = 100
+STALL_SECONDS = 0.02
+
+
+def configure(mode: str, path: str, slow_disk: bool):
+    sys.stderr = open(os.devnull, "w")
+    if slow_disk:
+        flush = logging.StreamHandler.flush
+        writes = 0
+
+        def slow_flush(handler):
+            nonlocal writes
+            if isinstance(handler, logging.FileHandler):
+                writes += 1
+                if writes % STALL_EVERY == 0:
+                    time.sleep(STALL_SECONDS)
+            flush(handler)
+
+        logging.StreamHandler.flush = slow_flush
+
+    if mode == "direct":
+        # Прежняя настройка bot.py
+        logging.basicConfig(
+            level=logging.INFO,
+            format=TEXT_FORMAT,
+            handlers=[logging.FileHandler(path), logging.StreamHandler()]
+        )
+    else:
+        setup_logging(
+            path,
+            sample_rate=0.1 if mode == "queue+sampling" else 1.0,
+            sampled_loggers=("aiogram.event",)
+        )
+
+
+async def measure(rate: int, duration: float) -> tuple:
+    """Возвращает длительности вызовов логгера и задержки цикла событий в микросекундах"""
+    logger = logging.getLogger("aiogram.event")
+    calls = []
+    lags = []
+    interval = WRITERS / rate
+    deadline = time.perf_counter() + duration
+
+    async def monitor():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append((time.perf_counter() - started - 0.001) * 1e6)
+
+    async def writer(index: int):
+        i = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            logger.info("Update id=%s is handled. Duration %s ms by bot id=%s", index * 10**9 + i, 3, 42)
+            calls.append((time.perf_counter() - started) * 1e6)
+            i += 1
+            await asyncio.sleep(interval)
+
+    await asyncio.gather(monitor(), *(writer(i) for i in range(WRITERS)))
+    return calls, lags
+
+
+def percentile(values: list, q: int) -> float:
+    return statistics.quantiles(values, n=100)[q - 1]
+
+
+def run(mode: str, slow_disk: bool, rate: int, duration: float):
+    path = os.path.join(tempfile.mkdtemp(), "bench.log")
+    configure(mode, path, slow_disk)
+    calls, lags = asyncio.run(measure(rate, duration))
+    scenario = "slow disk" if slow_disk else "page cache"
+    print(f"{scenario:>10} {mode:>15}  {sum(calls) / 1000 / duration:6.1f}ms/s on loop  "
+          f"call p50 {percentile(calls, 50):5.1f}us p99 {percentile(calls, 99):8.1f}us  "
+          f"loop lag p99 {percentile(lags, 99):8.1f}us max {max(lags):8.1f}us",
+          file=sys.__stdout__)
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--run":
+        run(sys.argv[2], sys.argv[3] == "1", int(sys.argv[4]), float(sys.argv[5]))
+        return
+
+    rate = sys.argv[1] if len(sys.argv) > 1 else "2000"
+    duration = sys.argv[2] if len(sys.argv) > 2 else "3"
+    for slow_disk in ("0", "1"):
+        for mode in MODES:
+            subprocess.run([sys.executable, __file__, "--run", mode, slow_disk, rate, duration], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Перенос старых отчетов в архив: размер рабочей базы, задержка записей во время переноса и выгрузки.
+
+Запуск: python benchmarks/report_archive.py [число отчетов] [размер пакета]
+Отчеты и уведомления распределены по трем годам; в архив уходит все старше года.
+Пока идет перенос, отдельная задача каждые 10 мс сохраняет отчет, как обработчик бота:
+ее задержка показывает, насколько перенос занимает писателя. Затем выгружаются год
+из рабочей базы и год из архива.
+"""
+import asyncio
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import archive
+import export
+from database import Database
+from migrations import apply_migrations
+
+DAYS = 3 * 365
+REPORT_TEXT = "Выполнены работы по объекту, замечаний нет. " * 2
+PROBE_INTERVAL = 0.01
+
+
+def seed(path: str, rows: int, today: date):
+    """Заполняет базу отчетами и уведомлениями равномерно по дням, без участия бота"""
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO reports (user_id, full_name, report_date, report_text, status) VALUES (?, ?, ?, ?, ?)",
+            (
+                (i % 1000, f"Сотрудник {i % 1000}", (today - timedelta(days=DAYS - i * DAYS // rows)).isoformat(),
+                 REPORT_TEXT, "На проверке" if i % 500 == 0 else "Принят")
+                for i in range(rows)
+            )
+        )
+        conn.executemany(
+            "INSERT INTO notifications (user_id, message, status, created_at) VALUES (?, ?, ?, ?)",
+            (
+                (i % 1000, "✅ Ваш отчет принят!", "sent",
+                 f"{(today - timedelta(days=DAYS - i * DAYS // (rows // 2))).isoformat()} 12:00:00")
+                for i in range(rows // 2)
+            )
+        )
+
+
+async def file_size(database: Database) -> int:
+    async with database.write() as db:
+        await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(database.path)
+
+
+async def export_time(database: Database, start: date, end: date, archive_path: str) -> tuple:
+    started = time.perf_counter()
+    first = None
+    rows = 0
+    async for _ in export.iter_reports(database, start.isoformat(), end.isoformat(), archive_path):
+        if first is None:
+            first = time.perf_counter() - started
+        rows += 1
+    return rows, first, time.perf_counter() - started
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else archive.BATCH_SIZE
+    tmp = tempfile.mkdtemp()
+    archive_path = os.path.join(tmp, "archive.db")
+    database = Database(os.path.join(tmp, "bench.db"))
+    await database.connect()
+    try:
+        await apply_migrations(database)
+        today = date.today()
+        seed(database.path, count, today)
+        before = (today - timedelta(days=365)).isoformat()
+        size = await file_size(database)
+        print(f"Seeded {count} reports and {count // 2} notifications, database {size / 2**20:.1f} MiB")
+
+        latencies = []
+        done = asyncio.Event()
+
+        async def probe():
+            # Сохранение отчета, как в receive_report_text
+            while not done.is_set():
+                started = time.perf_counter()
+                async with database.write() as db:
+                    await db.execute(
+                        """INSERT INTO reports (user_id, full_name, report_date, report_text, status)
+                        VALUES (?, ?, ?, ?, ?)""",
+                        (1, "Сотрудник 1", today.isoformat(), REPORT_TEXT, "На проверке")
+                    )
+                latencies.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(PROBE_INTERVAL)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        reports = await archive.archive_reports(database, archive_path, before, batch_size)
+        notifications = await archive.archive_notifications(database, archive_path, before, batch_size)
+        moved = time.perf_counter() - started
+        pages = await archive.incremental_vacuum(database)
+        vacuumed = time.perf_counter() - started - moved
+        done.set()
+        await probe_task
+
+        print(f"Archived {reports} reports and {notifications} notifications in {moved:.1f}s "
+              f"(batch {batch_size}), vacuum released {pages} pages in {vacuumed:.1f}s")
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(f"Report save during archival: {len(latencies)} saves, p50 {quantiles[49]:.2f} ms, "
+              f"p99 {quantiles[98]:.2f} ms, max {max(latencies):.2f} ms")
+        print(f"Database {size / 2**20:.1f} -> {await file_size(database) / 2**20:.1f} MiB, "
+              f"archive {os.path.getsize(archive_path) / 2**20:.1f} MiB")
+
+        print(f"\n{'export':<16}{'rows':>10}{'first row ms':>14}{'total s':>10}")
+        for name, start, end in (
+            ("hot year", today - timedelta(days=364), today),
+            ("archived year", today - timedelta(days=2 * 365), today - timedelta(days=366)),
+        ):
+            rows, first, total = await export_time(database, start, end, archive_path)
+            print(f"{name:<16}{rows:>10}{first * 1000:>14.2f}{total:>10.2f}")
+    finally:
+        await database.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""Волна отчётов в конце смены: транзакция на каждый отчёт против групповой фиксации.
+
+Запуск: python benchmarks/report_batching.py [секунд на замер] [отправителей ...]
+Каждый отправитель в цикле сохраняет отчёт так же, как receive_report_text
+(вставка отчёта и обновление недельной статистики), и сразу отправляет следующий.
+Итог: отчётов в секунду и задержка сохранения одного отчёта.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import stats
+from database import Database
+from migrations import apply_migrations
+from write_batcher import WriteBatcher
+
+DEFAULT_SUBMITTERS = (1, 50, 500)
+# (название, ожидание попутчиков в секундах); None — прежний путь без группировки
+MODES = (("direct", None), ("batched 0ms", 0), ("batched 1ms", 0.001), ("batched 5ms", 0.005))
+
+
+def report_writer(user_id: int, today: str):
+    async def save_report(db):
+        await db.execute(
+            """INSERT INTO reports
+            (user_id, full_name, photo_id, report_text, report_date, status)
+            VALUES (?, ?, ?, ?, ?, ?)""",
+            (user_id, f"Сотрудник {user_id}", "photo", "Отчёт", today, "На проверке")
+        )
+        await stats.record_report(db, user_id, f"Сотрудник {user_id}", today)
+    return save_report
+
+
+async def measure(submitters: int, max_delay, duration: float) -> tuple:
+    database = Database(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    await database.connect()
+    await apply_migrations(database)
+    batcher = WriteBatcher(database, max_delay=max_delay or 0)
+    batcher_task = asyncio.create_task(batcher.run())
+    today = date.today().isoformat()
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def submitter(user_id: int):
+        while time.perf_counter() < deadline:
+            save_report = report_writer(user_id, today)
+            started = time.perf_counter()
+            if max_delay is None:
+                async with database.write() as db:
+                    await save_report(db)
+            else:
+                await batcher.submit(save_report)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(submitter(user_id) for user_id in range(1, submitters + 1)))
+    elapsed = time.perf_counter() - started
+    batcher_task.cancel()
+    await asyncio.gather(batcher_task, return_exceptions=True)
+    await database.close()
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return len(latencies) / elapsed, quantiles[49], quantiles[98]
+
+
+async def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    sizes = [int(arg) for arg in sys.argv[2:]] or DEFAULT_SUBMITTERS
+    print(f"{'submitters':>10} {'mode':>12} {'reports/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for submitters in sizes:
+        for name, max_delay in MODES:
+            rate, p50, p99 = await measure(submitters, max_delay, duration)
+            print(f"{submitters:>10} {name:>12} {rate:>10.0f} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
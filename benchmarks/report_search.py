@@ -0,0 +1,106 @@
+"""Поиск по текстам отчетов: FTS5 против LIKE на большом архиве.
+
+Запуск: python benchmarks/report_search.py [число отчетов]
+Отчеты упоминают клиентов и адреса из небольшого словаря. Замеряются вставка
+с индексацией в триггере, заполнение индекса пакетами (как после миграции на
+существующей базе) и время запросов: первая страница поиска против LIKE '%…%'.
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import search
+from database import Database
+from migrations import apply_migrations
+
+CLIENTS = ("Ёлкин", "Смирнов", "Кузнецова", "Попов", "Васильев", "Петрова", "Соколов", "Михайлов",
+           "Новиков", "Фёдоров", "Морозова", "Волков", "Алексеев", "Лебедев", "Семёнов", "Егорова")
+STREETS = ("Ленина", "Гагарина", "Мира", "Советская", "Садовая", "Лесная", "Школьная", "Набережная")
+WORKS = ("монтаж кабеля", "замена счётчика", "проверка щита", "осмотр объекта", "пусконаладка",
+         "устранение протечки", "покраска фасада", "установка окон")
+QUERIES = ("Ёлкин", "елкин ленина", "Кузнецова", "счетчик", "монтаж Садовая", "Сотрудник 4217",
+           "пусконаладка Фёдоров Мира 12")
+BATCH = 10_000
+
+
+def report_text(rng: random.Random) -> str:
+    return (f"{rng.choice(WORKS).capitalize()} у клиента {rng.choice(CLIENTS)}, "
+            f"ул. {rng.choice(STREETS)}, д. {rng.randint(1, 150)}. {rng.choice(WORKS).capitalize()} завершена.")
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(1)
+    database = Database(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    await database.connect()
+    try:
+        await apply_migrations(database)
+        start = date.today() - timedelta(days=365)
+
+        started = time.perf_counter()
+        for offset in range(0, count, BATCH):
+            async with database.write() as db:
+                await db.executemany(
+                    """INSERT INTO reports (user_id, full_name, photo_id, report_text, report_date, status)
+                    VALUES (?, ?, ?, ?, ?, ?)""",
+                    [(i % 5000, f"Сотрудник {i % 5000}", "photo", report_text(rng),
+                      (start + timedelta(days=i * 365 // count)).isoformat(), "Принят")
+                     for i in range(offset, min(offset + BATCH, count))]
+                )
+        insert_time = time.perf_counter() - started
+        print(f"Inserted {count} reports with trigger indexing in {insert_time:.1f}s "
+              f"({count / insert_time:.0f}/s)")
+
+        # Как на базе, где отчеты появились до поиска: индекс пуст, граница — последний отчет
+        async with database.write() as db:
+            await db.execute("INSERT INTO reports_fts (reports_fts) VALUES ('delete-all')")
+            await db.execute("INSERT OR REPLACE INTO search_backfill (table_name, upto) SELECT 'reports', MAX(id) FROM reports")
+        started = time.perf_counter()
+        indexed = await search.backfill_search_index(database)
+        backfill_time = time.perf_counter() - started
+        print(f"Backfilled {indexed} reports in {backfill_time:.1f}s ({indexed / backfill_time:.0f}/s)")
+
+        async with database.write() as db:
+            await db.execute("INSERT INTO reports_fts (reports_fts) VALUES ('optimize')")
+
+        async def fts_query(query: str) -> float:
+            started = time.perf_counter()
+            await search.search_reports(database, search.build_match_query(query), 0, 11)
+            return time.perf_counter() - started
+
+        async def like_query(query: str) -> float:
+            # Прежний способ найти отчет: LIKE по каждому слову, без индекса
+            words = query.split()
+            condition = " AND ".join("(report_text LIKE ? OR full_name LIKE ?)" for _ in words)
+            params = [f"%{word}%" for word in words for _ in range(2)]
+            started = time.perf_counter()
+            async with database.read() as db:
+                async with db.execute(
+                    f"SELECT id, report_date, full_name, status FROM reports WHERE {condition} LIMIT 11",
+                    params
+                ) as cursor:
+                    await cursor.fetchall()
+            return time.perf_counter() - started
+
+        async def median_of(run, query: str, repeat: int = 5) -> float:
+            return statistics.median([await run(query) for _ in range(repeat)])
+
+        print(f"\n{'query':<32}{'FTS5 ms':>10}{'LIKE ms':>10}")
+        for query in QUERIES:
+            fts = await median_of(fts_query, query)
+            like = await median_of(like_query, query, repeat=1)
+            print(f"{query:<32}{fts * 1000:>10.2f}{like * 1000:>10.1f}")
+    finally:
+        await database.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+"""Сравнение задержки «обновление → ответ бота» в режимах webhook и long polling.
+
+Запуск: python benchmarks/webhook_latency.py [число обновлений]
+Сеть не нужна: бот работает против локальной заглушки Bot API.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARKBENCHMARKBENCHMARKBENCHMA")
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["LOG_FILE"] = os.path.join(tempfile.mkdtemp(), "bench.log")
+os.environ.pop("WEBHOOK_URL", None)
+
+import aiohttp
+from aiohttp import web
+from fake_bot_api import FakeBotAPI
+import bot as app
+
+WEBHOOK_SECRET = "benchmark-secret"
+
+
+class ReplyWaiter:
+    """Сопоставляет отправленное обновление с ответом бота в тот же чат"""
+
+    def __init__(self):
+        self.pending = {}
+
+    def expect(self, chat_id: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.pending[chat_id] = future
+        return future
+
+    def __call__(self, method: str, payload: dict, received: float):
+        if method != "sendmessage":
+            return
+        future = self.pending.pop(int(payload.get("chat_id", 0)), None)
+        if future and not future.done():
+            future.set_result(received)
+
+
+async def measure(api: FakeBotAPI, waiter: ReplyWaiter, deliver, count: int) -> list:
+    """Отправляет обновления по одному и возвращает задержки в миллисекундах"""
+    latencies = []
+    for i in range(count):
+        chat_id = 1_000_000 + i
+        reply = waiter.expect(chat_id)
+        started = time.perf_counter()
+        await deliver(api.make_message_update(chat_id, "/start"))
+        latencies.append((await asyncio.wait_for(reply, 10) - started) * 1000)
+    return latencies
+
+
+async def run_polling(api: FakeBotAPI, waiter: ReplyWaiter, count: int) -> list:
+    polling = asyncio.create_task(app.dp.start_polling(app.bot, handle_signals=False, close_bot_session=False))
+    await asyncio.sleep(0.2)
+
+    async def deliver(update):
+        api.push_update(update)
+
+    try:
+        return await measure(api, waiter, deliver, count)
+    finally:
+        await app.dp.stop_polling()
+        await polling
+
+
+async def run_webhook(api: FakeBotAPI, waiter: ReplyWaiter, count: int) -> list:
+    app.WEBHOOK_SECRET = WEBHOOK_SECRET
+    runner = web.AppRunner(app.create_webhook_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}{app.WEBHOOK_PATH}"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET}
+
+    async with aiohttp.ClientSession() as session:
+        # Запрос без секрета должен быть отклонён
+        async with session.post(url, json=api.make_message_update(1, "/start")) as response:
+            assert response.status == 401, response.status
+
+        async def deliver(update):
+            async with session.post(url, json=update, headers=headers) as response:
+                assert response.status == 200, response.status
+
+        try:
+            return await measure(api, waiter, deliver, count)
+        finally:
+            await runner.cleanup()
+
+
+def summary(name: str, latencies: list) -> str:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    return (
+        f"{name:<8} n={len(latencies)} "
+        f"p50={statistics.median(latencies):.2f}ms p95={p95:.2f}ms max={latencies[-1]:.2f}ms"
+    )
+
+
+async def main(count: int):
+    api = FakeBotAPI()
+    await api.start()
+    api.attach(app.bot)
+    waiter = ReplyWaiter()
+    api.listeners.append(waiter)
+
+    await app.on_startup()
+    try:
+        polling = await run_polling(api, waiter, count)
+        webhook = await run_webhook(api, waiter, count)
+    finally:
+        await app.on_shutdown()
+        await app.bot.session.close()
+        await api.stop()
+
+    print(summary("polling", polling))
+    print(summary("webhook", webhook))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -1,49 +1,163 @@
 import asyncio
+import json
 import logging
-import aiosqlite
 import os
 import aiocron
 import random
+import signal
+import time
 from datetime import datetime, timedelta
 from os import getenv
 from dotenv import load_dotenv
+from aiohttp import web
 from aiogram import Bot, Dispatcher, types, F
-from aiogram.filters import Command, StateFilter
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.state import State, StatesGroup
 from pathlib import Path
-from aiogram.types import FSInputFile
 from aiogram.fsm.context import FSMContext
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+import archive
+import deadlines
+import export
+from broadcast import Broadcaster
+from cache import MISSING, TTLCache
+from database import Database
+import stats
+from fsm_storage import SQLiteStorage
+from leader import LeaderLease
+from logging_setup import setup_logging
+import metrics
+import outbox
+import reminders
+import search
+from throttling import ThrottlingMiddleware
+from write_batcher import WriteBatcher
+from media import MediaRegistry
+from migrations import apply_migrations, convert_legacy_dates
 from aiogram.types import (
     ReplyKeyboardMarkup,
     KeyboardButton,
     ReplyKeyboardRemove,
     InlineKeyboardMarkup,
-    InlineKeyboardButton
+    InlineKeyboardButton,
+    FSInputFile
 )
 
 # === Конфигурация ===
 load_dotenv()
 TOKEN = getenv("BOT_TOKEN")
-ADMINS = list(map(int, getenv("ADMINS", "").split(","))) if getenv("ADMINS") else []
+ADMINS = frozenset(map(int, getenv("ADMINS", "").split(","))) if getenv("ADMINS") else frozenset()
 DB_PATH = getenv("DB_PATH", "reports.db")
+DB_READERS = int(getenv("DB_READERS", "4"))
+# Сколько секунд отчёт остаётся закреплённым за проверяющим админом
+REVIEW_CLAIM_TTL = int(getenv("REVIEW_CLAIM_TTL", str(15 * 60)))
+# Незавершённые диалоги (FSM) хранятся в БД и удаляются после простоя
+FSM_TTL = int(getenv("FSM_TTL", str(24 * 60 * 60)))
 EMPLOYEE_CODE = str(getenv("EMPLOYEE_CODE", "0000"))
+USERS_PAGE_SIZE = int(getenv("USERS_PAGE_SIZE", "10"))
+REPORTS_PAGE_SIZE = int(getenv("REPORTS_PAGE_SIZE", "10"))
+# Предел длины сообщения Telegram в единицах UTF-16
+MESSAGE_LIMIT = 4096
+# Кэш сведений о сотрудниках: регистрация меняется редко и сбрасывает кэш явно
+USER_CACHE_SIZE = int(getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = int(getenv("USER_CACHE_TTL", "600"))
+# Лимиты рассылки: Telegram допускает ~30 сообщений в секунду и ~1 в секунду в один чат
+BROADCAST_RATE = float(getenv("BROADCAST_RATE", "30"))
+BROADCAST_CHAT_RATE = float(getenv("BROADCAST_CHAT_RATE", "1"))
+BROADCAST_CONCURRENCY = int(getenv("BROADCAST_CONCURRENCY", "30"))
+# Режим webhook включается, если задан WEBHOOK_URL; иначе используется long polling
+WEBHOOK_URL = getenv("WEBHOOK_URL")
+WEBHOOK_PATH = getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = getenv("WEBHOOK_SECRET")
+WEBAPP_HOST = getenv("WEBAPP_HOST", "127.0.0.1")
+WEBAPP_PORT = int(getenv("WEBAPP_PORT", "8080"))
+# Несколько воркеров за прокси слушают один порт; удалять webhook при остановке одного из них не нужно.
+# Фоновые задачи (outbox, сроки, расписания) выполняет один ведущий воркер, пока продлевает аренду LEADER_TTL.
+# Кэши сотрудников у каждого воркера свои: изменения из другого воркера видны через USER_CACHE_TTL
+WEBAPP_REUSE_PORT = getenv("WEBAPP_REUSE_PORT", "0") == "1"
+LEADER_TTL = float(getenv("LEADER_TTL", "30"))
+WEBHOOK_DELETE_ON_SHUTDOWN = getenv("WEBHOOK_DELETE_ON_SHUTDOWN", "1") == "1"
+# Чат для предварительной загрузки медиафайлов при старте (необязательно)
+MEDIA_WARMUP_CHAT_ID = int(getenv("MEDIA_WARMUP_CHAT_ID")) if getenv("MEDIA_WARMUP_CHAT_ID") else None
+# Расписания напоминаний об отчёте (crontab через «;»), пустое значение отключает напоминания
+REMINDER_CRONS = [spec.strip() for spec in getenv("REMINDER_CRONS", "0 17 * * 1-5").split(";") if spec.strip()]
+# Антифлуд: пользователь копит до THROTTLE_BURST токенов, THROTTLE_RATE в секунду; 0 отключает ограничение
+THROTTLE_RATE = float(getenv("THROTTLE_RATE", "1"))
+THROTTLE_BURST = float(getenv("THROTTLE_BURST", "10"))
+# Обработчики, отправляющие видео, стоят дороже остальных
+THROTTLE_MEDIA_COST = float(getenv("THROTTLE_MEDIA_COST", "3"))
+# Групповая фиксация отчётов: ожидание попутчиков (мс) и наибольший размер транзакции
+REPORT_BATCH_DELAY_MS = float(getenv("REPORT_BATCH_DELAY_MS", "1"))
+REPORT_BATCH_SIZE = int(getenv("REPORT_BATCH_SIZE", "200"))
+# За сколько часов до срока задачи напомнить сотруднику; срок без времени означает DEADLINE_DEFAULT_TIME
+DEADLINE_REMIND_HOURS = float(getenv("DEADLINE_REMIND_HOURS", "3"))
+DEADLINE_DEFAULT_TIME = getenv("DEADLINE_DEFAULT_TIME", "18:00")
+# Архив: проверенные отчёты и отправленные уведомления старше ARCHIVE_AFTER_DAYS дней переносятся
+# по расписанию ARCHIVE_CRON в отдельный файл пакетами по ARCHIVE_BATCH_SIZE; пустое расписание отключает перенос
+ARCHIVE_PATH = getenv("ARCHIVE_PATH", str(Path(DB_PATH).with_name(f"{Path(DB_PATH).stem}_archive.db")))
+ARCHIVE_CRON = getenv("ARCHIVE_CRON", "30 3 * * *").strip()
+ARCHIVE_AFTER_DAYS = int(getenv("ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_BATCH_SIZE = int(getenv("ARCHIVE_BATCH_SIZE", "500"))
+# Метрики в формате Prometheus на http://METRICS_HOST:METRICS_PORT/metrics (если задан порт)
+METRICS_HOST = getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(getenv("METRICS_PORT")) if getenv("METRICS_PORT") else None
+
+# Логи пишет отдельный поток; файл ротируется по размеру или, если задан LOG_ROTATE_WHEN (например, midnight), по времени
+LOG_FILE = getenv("LOG_FILE", "bot.log")
+LOG_LEVEL = getenv("LOG_LEVEL", "INFO")
+LOG_JSON = getenv("LOG_FORMAT", "text") == "json"
+LOG_MAX_BYTES = int(getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_WHEN = getenv("LOG_ROTATE_WHEN")
+LOG_BACKUPS = int(getenv("LOG_BACKUPS", "7"))
+# Доля INFO-записей шумных логгеров, попадающих в лог (обработка каждого обновления и т.п.)
+LOG_SAMPLE_RATE = float(getenv("LOG_SAMPLE_RATE", "1"))
+LOG_SAMPLED_LOGGERS = tuple(filter(None, getenv("LOG_SAMPLED_LOGGERS", "aiogram.event").split(",")))
 
 # Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("bot.log"),
-        logging.StreamHandler()
-    ]
+setup_logging(
+    LOG_FILE,
+    level=LOG_LEVEL,
+    json_format=LOG_JSON,
+    max_bytes=LOG_MAX_BYTES,
+    rotate_when=LOG_ROTATE_WHEN,
+    backups=LOG_BACKUPS,
+    sample_rate=LOG_SAMPLE_RATE,
+    sampled_loggers=LOG_SAMPLED_LOGGERS
 )
 logger = logging.getLogger(__name__)
 
 # Инициализация бота
 bot = Bot(token=TOKEN)
-storage = MemoryStorage()
+database = Database(DB_PATH, readers=DB_READERS)
+storage = SQLiteStorage(database, ttl=FSM_TTL)
 dp = Dispatcher(storage=storage)
+# Антифлуд регистрируется первым: отклонённые обновления не доходят до обработчиков
+throttling = ThrottlingMiddleware(
+    THROTTLE_RATE,
+    THROTTLE_BURST,
+    costs={
+        name: THROTTLE_MEDIA_COST
+        for name in ("start_report", "show_user_reports", "show_personal_cabinet", "show_user_tasks", "send_motivation")
+    },
+    exempt=ADMINS)
+if THROTTLE_RATE > 0:
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
+# Время и ошибки обработчиков и запросов к Bot API
+dp.message.middleware(metrics.HandlerMetricsMiddleware())
+dp.callback_query.middleware(metrics.HandlerMetricsMiddleware())
+bot.session.middleware(metrics.ApiMetricsMiddleware())
+broadcaster = Broadcaster(
+    bot,
+    global_rate=BROADCAST_RATE,
+    chat_rate=BROADCAST_CHAT_RATE,
+    concurrency=BROADCAST_CONCURRENCY
+)
+outbox_worker = outbox.OutboxWorker(database, broadcaster)
+report_writer = WriteBatcher(database, max_delay=REPORT_BATCH_DELAY_MS / 1000, max_batch=REPORT_BATCH_SIZE)
+deadline_scheduler = deadlines.DeadlineScheduler(
+    database, ADMINS, DEADLINE_REMIND_HOURS * 3600, wake_outbox=outbox_worker.wake)
+leader = LeaderLease(database, ttl=LEADER_TTL)
 
 # Пути к медиафайлам
 MEDIA_FILES = {
@@ -53,15 +167,23 @@ MEDIA_FILES = {
     "tasks": "tasks.mp4",
     "motivation": "motivation.mp4"
 }
+media_registry = MediaRegistry(database, Path(__file__).parent, MEDIA_FILES)
+
+# Даты хранятся в ISO-8601 (сортируются как строки), показываются как ДД.ММ.ГГГГ
+DATE_FORMAT = "%Y-%m-%d"
+DISPLAY_DATE_FORMAT = "%d.%m.%Y"
 
 # Состояния FSM
 class AdminStates(StatesGroup):
     waiting_task_type = State()
     waiting_task_text = State()
+    waiting_task_deadline = State()
     waiting_task_assign = State()
+    waiting_task_search = State()
     waiting_report_period = State()
     waiting_custom_period = State()
     waiting_revision_reason = State()
+    waiting_report_search = State()
 
 class UserStates(StatesGroup):
     waiting_for_code = State()
@@ -69,58 +191,364 @@ class UserStates(StatesGroup):
     waiting_for_text = State()
 
 # === Вспомогательные функции ===
-async def send_media(message: types.Message, media_key: str, caption: str = "") -> bool:
-    """Отправляет медиафайл из локального хранилища"""
+background_tasks = set()
+
+def run_in_background(coro):
+    """Запускает фоновую задачу и хранит ссылку на неё до завершения"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def send_media(message: types.Message, media_key: str, caption: str = "", reply_markup=None) -> bool:
+    """Отправляет медиафайл, загружая его в Telegram только один раз"""
     try:
-        current_dir = Path(__file__).parent
-        media_filename = MEDIA_FILES.get(media_key)
+        media_path = media_registry.resolve(media_key)
         
-        if not media_filename:
+        if not media_path:
             logger.error(f"Unknown media key: {media_key}")
             return False
         
-        media_path = current_dir / media_filename
         if not media_path.exists():
             logger.error(f"Media file not found: {media_path}")
             await message.answer("⚠ Медиафайл временно недоступен")
             return False
         
-        media = FSInputFile(path=str(media_path))
-        
-        if media_path.suffix == ".mp4":
-            await message.answer_video(video=media, caption=caption, supports_streaming=True)
-        else:
-            await message.answer_photo(photo=media, caption=caption)
-            
+        await media_registry.send(bot, message.chat.id, media_path, caption=caption, reply_markup=reply_markup)
         return True
     
     except Exception as e:
         logger.error(f"Error sending media {media_key}: {str(e)}")
-        await message.answer(f"⚠ Не удалось отправить медиафайл. {caption}")
+        await message.answer(f"⚠ Не удалось отправить медиафайл. {caption}", reply_markup=reply_markup)
         return False
 
+def admin_messages(text: str, exclude_id: int = None) -> list:
+    """Возвращает [(admin_id, текст)] для всех админов"""
+    return [(admin_id, text) for admin_id in ADMINS if admin_id != exclude_id]
+
 async def notify_admins(text: str, exclude_id: int = None):
-    """Отправляет уведомление всем админам"""
-    for admin_id in ADMINS:
-        if admin_id != exclude_id:
-            try:
-                await bot.send_message(admin_id, text)
-            except Exception as e:
-                logger.error(f"Failed to notify admin {admin_id}: {e}")
+    """Отправляет уведомление всем админам сразу, минуя outbox"""
+    await broadcaster.broadcast(admin_messages(text, exclude_id))
+
+# user_id -> (full_name, position) зарегистрированных сотрудников
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+async def get_user(user_id: int):
+    """Возвращает (full_name, position) сотрудника или None, обращаясь к БД только при промахе кэша"""
+    async def load():
+        async with database.read() as db:
+            async with db.execute(
+                "SELECT full_name, position FROM users WHERE user_id = ?", (user_id,)
+            ) as cursor:
+                return await cursor.fetchone()
+    
+    # Отсутствие не кэшируется: регистрация в другом воркере не сбрасывает кэш этого процесса
+    return await user_cache.get_or_load(user_id, load, cache_none=False)
 
 async def get_user_name(user_id: int) -> str:
-    """Получает имя пользователя из БД"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute("SELECT full_name FROM users WHERE user_id = ?", (user_id,)) as cursor:
-            result = await cursor.fetchone()
-            return result[0] if result else "Неизвестный пользователь"
+    """Получает имя пользователя"""
+    user = await get_user(user_id)
+    return user[0] if user else "Неизвестный пользователь"
+
+def format_date(value: str) -> str:
+    """Переводит дату из формата хранения в ДД.ММ.ГГГГ"""
+    try:
+        return datetime.strptime(value, DATE_FORMAT).strftime(DISPLAY_DATE_FORMAT)
+    except (TypeError, ValueError):
+        return value
+
+def parse_display_date(value: str) -> str:
+    """Переводит дату ДД.ММ.ГГГГ в формат хранения"""
+    return datetime.strptime(value.strip(), DISPLAY_DATE_FORMAT).strftime(DATE_FORMAT)
+
+def parse_deadline(value: str) -> str:
+    """Переводит срок ДД.ММ.ГГГГ [ЧЧ:ММ] в формат хранения; без времени срок — DEADLINE_DEFAULT_TIME"""
+    value = " ".join(value.split())
+    if " " not in value:
+        value = f"{value} {DEADLINE_DEFAULT_TIME}"
+    return datetime.strptime(value, deadlines.DISPLAY_DEADLINE_FORMAT).strftime(deadlines.DEADLINE_FORMAT)
+
+def get_current_week() -> tuple:
+    """Возвращает начало текущей недели и сегодняшний день в формате хранения"""
+    today = datetime.now().date()
+    start = today - timedelta(days=today.weekday())
+    return start.strftime(DATE_FORMAT), today.strftime(DATE_FORMAT)
+
+# Страницы списка сотрудников: (префикс, курсор, назад) -> (сотрудники, есть ещё)
+users_page_cache = TTLCache(maxsize=1000, ttl=USER_CACHE_TTL)
+
+def invalidate_users_cache(user_id: int = None):
+    """Сбрасывает кэши после изменения списка сотрудников"""
+    users_page_cache.clear()
+    if user_id is not None:
+        user_cache.invalidate(user_id)
+
+async def fetch_users_page(prefix: str = "", cursor: int = None, backward: bool = False) -> tuple:
+    """Возвращает страницу сотрудников по курсору (user_id) одним ограниченным запросом"""
+    cache_key = (prefix, cursor, backward)
+    page = users_page_cache.get(cache_key)
+    if page is not MISSING:
+        return page
+    
+    # Имена сравниваются в casefold; курсор задаёт начало диапазона индекса, префикс — его конец
+    async with database.read() as db:
+        if backward:
+            async with db.execute(
+                """SELECT user_id, full_name FROM users
+                WHERE (search_name, user_id) < (SELECT search_name, user_id FROM users WHERE user_id = ?)
+                AND search_name >= ?
+                ORDER BY search_name DESC, user_id DESC
+                LIMIT ?""",
+                (cursor, prefix, USERS_PAGE_SIZE + 1)
+            ) as db_cursor:
+                users = list(reversed(await db_cursor.fetchall()))
+            has_more = len(users) > USERS_PAGE_SIZE
+            users = users[-USERS_PAGE_SIZE:]
+        else:
+            async with db.execute(
+                """SELECT user_id, full_name FROM users
+                WHERE (search_name, user_id) > (
+                    SELECT COALESCE(MAX(search_name), ?), COALESCE(MAX(user_id), 0)
+                    FROM users WHERE user_id = ?
+                )
+                AND search_name < ?
+                ORDER BY search_name, user_id
+                LIMIT ?""",
+                (prefix, cursor, prefix + "\U0010ffff", USERS_PAGE_SIZE + 1)
+            ) as db_cursor:
+                users = await db_cursor.fetchall()
+            has_more = len(users) > USERS_PAGE_SIZE
+            users = users[:USERS_PAGE_SIZE]
+    
+    users_page_cache.set(cache_key, (users, has_more))
+    return users, has_more
+
+async def get_users_page_markup(prefix: str = "", cursor: int = None, backward: bool = False,
+                                selection: dict = None):
+    """Клавиатура страницы сотрудников или None, если никого не найдено"""
+    users, has_more = await fetch_users_page(prefix, cursor, backward)
+    if not users:
+        return None
+    if backward:
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = cursor is not None, has_more
+    selection = selection or {}
+    return get_users_keyboard(
+        users, has_prev, has_next, searching=bool(prefix),
+        selected=set(selection.get("selected_users", ())), can_assign=has_task_selection(selection))
+
+def has_task_selection(selection: dict) -> bool:
+    """Отмечен ли хоть один получатель задачи"""
+    return bool(
+        selection.get("selected_all")
+        or selection.get("selected_positions")
+        or selection.get("selected_users"))
+
+def get_selection_text(selection: dict) -> str:
+    """Описание выбранных получателей задачи"""
+    parts = []
+    if selection.get("selected_all"):
+        parts.append("все сотрудники")
+    parts.extend(selection.get("selected_positions", ()))
+    if selection.get("selected_users"):
+        parts.append(f"отмечено сотрудников: {len(selection['selected_users'])}")
+    if not parts:
+        return "Отметьте сотрудников или группы и нажмите «Назначить»."
+    return "✅ Выбрано: " + ", ".join(parts)
+
+def get_users_page_text(prefix: str = "", selection: dict = None) -> str:
+    text = "Выберите сотрудников для назначения задачи:"
+    if prefix:
+        text += f"\n🔍 Поиск: «{prefix}»"
+    return text + "\n" + get_selection_text(selection or {})
+
+async def get_positions() -> list:
+    """Должности сотрудников для групповых задач"""
+    async with database.read() as db:
+        # Не больше 50 групп: у инлайн-клавиатуры Telegram ограничено число кнопок
+        async with db.execute(
+            "SELECT DISTINCT position FROM users ORDER BY position LIMIT 50"
+        ) as cursor:
+            return [position for position, in await cursor.fetchall()]
+
+def utf16_len(text: str) -> int:
+    """Длина текста так, как её считает Telegram"""
+    return len(text.encode("utf-16-le")) // 2
+
+def truncate_utf16(text: str, limit: int) -> str:
+    """Обрезает текст до limit единиц UTF-16, не разрывая символы"""
+    if utf16_len(text) <= limit:
+        return text
+    return text.encode("utf-16-le")[:(limit - 1) * 2].decode("utf-16-le", errors="ignore") + "…"
+
+async def fetch_archived_reports_page(db, start_date: str, end_date: str, cursor: int, backward: bool) -> list:
+    """Строки страницы отчетов из рабочей базы и подключенного архива, слитые по индексам (report_date, id)"""
+    # Отчет-курсор может лежать в любой из баз
+    async with db.execute(
+        """SELECT report_date, id FROM main.reports WHERE id = ?
+        UNION ALL
+        SELECT report_date, id FROM archive.reports WHERE id = ?
+        LIMIT 1""",
+        (cursor, cursor)
+    ) as db_cursor:
+        anchor = await db_cursor.fetchone()
+    
+    # Строку, уже скопированную в архив, но еще не удаленную из рабочей базы, берем только из рабочей
+    if backward:
+        if anchor is None:
+            return []
+        async with db.execute(
+            """SELECT id, report_date, full_name, report_text, status FROM main.reports
+            WHERE (report_date, id) < (?, ?) AND report_date >= ?
+            UNION ALL
+            SELECT id, report_date, full_name, report_text, status FROM archive.reports a
+            WHERE (report_date, id) < (?, ?) AND report_date >= ?
+            AND NOT EXISTS (SELECT 1 FROM main.reports m WHERE m.id = a.id)
+            ORDER BY report_date DESC, id DESC
+            LIMIT ?""",
+            (*anchor, start_date, *anchor, start_date, REPORTS_PAGE_SIZE + 1)
+        ) as db_cursor:
+            return await db_cursor.fetchall()
+    
+    anchor = anchor or (start_date, 0)
+    async with db.execute(
+        """SELECT id, report_date, full_name, report_text, status FROM main.reports
+        WHERE (report_date, id) > (?, ?) AND report_date <= ?
+        UNION ALL
+        SELECT id, report_date, full_name, report_text, status FROM archive.reports a
+        WHERE (report_date, id) > (?, ?) AND report_date <= ?
+        AND NOT EXISTS (SELECT 1 FROM main.reports m WHERE m.id = a.id)
+        ORDER BY report_date, id
+        LIMIT ?""",
+        (*anchor, end_date, *anchor, end_date, REPORTS_PAGE_SIZE + 1)
+    ) as db_cursor:
+        return await db_cursor.fetchall()
+
+async def fetch_reports_page(start_date: str, end_date: str, cursor: int = None, backward: bool = False) -> tuple:
+    """Возвращает страницу отчетов периода по курсору (id отчета) одним запросом по индексу (report_date, id)"""
+    async with database.read() as db:
+        if await archive.reaches_archive(db, "reports", start_date):
+            # Архив подключается только к периодам, которые в него уходят
+            async with archive.attached(db, ARCHIVE_PATH):
+                reports = await fetch_archived_reports_page(db, start_date, end_date, cursor, backward)
+        elif backward:
+            async with db.execute(
+                """SELECT id, report_date, full_name, report_text, status FROM reports
+                WHERE (report_date, id) < (SELECT report_date, id FROM reports WHERE id = ?)
+                AND report_date >= ?
+                ORDER BY report_date DESC, id DESC
+                LIMIT ?""",
+                (cursor, start_date, REPORTS_PAGE_SIZE + 1)
+            ) as db_cursor:
+                reports = await db_cursor.fetchall()
+        else:
+            async with db.execute(
+                """SELECT id, report_date, full_name, report_text, status FROM reports
+                WHERE (report_date, id) > (
+                    SELECT COALESCE(MAX(report_date), ?), COALESCE(MAX(id), 0)
+                    FROM reports WHERE id = ?
+                )
+                AND report_date <= ?
+                ORDER BY report_date, id
+                LIMIT ?""",
+                (start_date, cursor, end_date, REPORTS_PAGE_SIZE + 1)
+            ) as db_cursor:
+                reports = await db_cursor.fetchall()
+    
+    has_more = len(reports) > REPORTS_PAGE_SIZE
+    if backward:
+        reports.reverse()
+        return reports[-REPORTS_PAGE_SIZE:], has_more
+    return reports[:REPORTS_PAGE_SIZE], has_more
+
+def format_report_entry(report_date: str, full_name: str, report_text: str, status: str,
+                        with_date: bool, limit: int = MESSAGE_LIMIT) -> str:
+    """Текст одного отчета в просмотре периода; слишком длинный текст отчета обрезается до limit"""
+    head = f"\n📅 {format_date(report_date)}\n" if with_date else ""
+    head += f"👤 {full_name}\n"
+    tail = f"🔄 {status}\n\n"
+    if not report_text:
+        return head + tail
+    body = f"📝 {report_text}\n"
+    overflow = utf16_len(head + body + tail) - limit
+    if overflow > 0:
+        body = truncate_utf16(body, utf16_len(body) - overflow - 1) + "\n"
+    return head + body + tail
+
+def render_reports_page(start_date: str, end_date: str, reports: list, backward: bool) -> tuple:
+    """Собирает страницу из целых отчетов в пределах MESSAGE_LIMIT; возвращает (текст, показанные отчеты)"""
+    header = f"📊 Отчеты за период с {format_date(start_date)} по {format_date(end_date)}:\n"
+    limit = MESSAGE_LIMIT - utf16_len(header)
+    budget = limit
+    
+    # При листании назад страница набирается от курсора, чтобы между страницами не было пропусков
+    ordered = reversed(reports) if backward else reports
+    shown = []
+    for report in ordered:
+        size = utf16_len(format_report_entry(*report[1:], with_date=True, limit=limit))
+        if shown and size > budget:
+            break
+        shown.append(report)
+        budget -= size
+    if backward:
+        shown.reverse()
+    
+    text = header
+    current_date = None
+    for _, report_date, full_name, report_text, status in shown:
+        text += format_report_entry(
+            report_date, full_name, report_text, status,
+            with_date=report_date != current_date, limit=limit)
+        current_date = report_date
+    return text, shown
+
+async def get_reports_page(start_date: str, end_date: str, cursor: int = None, backward: bool = False):
+    """Текст и клавиатура страницы отчетов за период или None, если отчетов нет"""
+    reports, has_more = await fetch_reports_page(start_date, end_date, cursor, backward)
+    if not reports:
+        return None
+    text, shown = render_reports_page(start_date, end_date, reports, backward)
+    truncated = len(shown) < len(reports)
+    if backward:
+        has_prev, has_next = has_more or truncated, True
+    else:
+        has_prev, has_next = cursor is not None, has_more or truncated
+    markup = get_reports_page_keyboard(start_date, end_date, shown[0][0], shown[-1][0], has_prev, has_next)
+    return text, markup
+
+async def get_search_page(query: str, offset: int = 0):
+    """Текст и клавиатура страницы результатов поиска или None, если ничего не найдено"""
+    match_query = search.build_match_query(query)
+    if not match_query:
+        return None
+    hits = await search.search_reports(database, match_query, offset, REPORTS_PAGE_SIZE + 1)
+    if not hits:
+        return None
+    
+    text = f"🔍 Отчеты по запросу «{query}»"
+    text += f" (с {offset + 1}-го):\n" if offset else ":\n"
+    for _, report_date, full_name, status, snippet in hits[:REPORTS_PAGE_SIZE]:
+        text += f"\n📅 {format_date(report_date)} 👤 {full_name}\n"
+        if snippet:
+            text += f"📝 {snippet}\n"
+        text += f"🔄 {status}\n"
+    
+    navigation = []
+    if offset:
+        navigation.append(InlineKeyboardButton(
+            text="◀", callback_data=f"search_{max(offset - REPORTS_PAGE_SIZE, 0)}"))
+    if len(hits) > REPORTS_PAGE_SIZE:
+        navigation.append(InlineKeyboardButton(
+            text="▶", callback_data=f"search_{offset + REPORTS_PAGE_SIZE}"))
+    return truncate_utf16(text, MESSAGE_LIMIT), InlineKeyboardMarkup(inline_keyboard=[navigation])
 
 # === Клавиатуры ===
 def get_main_keyboard(is_admin: bool = False):
     """Главное меню"""
     if is_admin:
         buttons = [
-            [KeyboardButton(text="📊 Посмотреть Отчеты")],
+            [KeyboardButton(text="📊 Посмотреть Отчеты"), KeyboardButton(text="🔍 Поиск Отчетов")],
             [KeyboardButton(text="📌 Отправить Задачи")],
             [KeyboardButton(text="🏆 Рейтинг Сотрудников")],
             [KeyboardButton(text="✅ Проверить Отчеты")]
@@ -152,6 +580,28 @@ def get_report_period_keyboard():
         resize_keyboard=True
     )
 
+def get_reports_page_keyboard(start_date: str, end_date: str, first_id: int, last_id: int,
+                              has_prev: bool, has_next: bool):
+    """Инлайн-клавиатура страницы отчетов за период: листание и выгрузка в файл"""
+    keyboard = []
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton(
+            text="◀", callback_data=f"period_prev_{start_date}_{end_date}_{first_id}"))
+    if has_next:
+        navigation.append(InlineKeyboardButton(
+            text="▶", callback_data=f"period_next_{start_date}_{end_date}_{last_id}"))
+    if navigation:
+        keyboard.append(navigation)
+    
+    keyboard.append([
+        InlineKeyboardButton(
+            text=f"📥 Выгрузить {file_format.upper()}",
+            callback_data=f"export_{file_format}_{start_date}_{end_date}")
+        for file_format in export.FORMATS
+    ])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
 def get_task_type_keyboard():
     """Клавиатура выбора типа задачи"""
     return ReplyKeyboardMarkup(
@@ -163,71 +613,100 @@ def get_task_type_keyboard():
         resize_keyboard=True
     )
 
+def get_deadline_keyboard():
+    """Клавиатура ввода срока задачи"""
+    return ReplyKeyboardMarkup(
+        keyboard=[
+            [KeyboardButton(text="⏭ Без срока")],
+            [KeyboardButton(text="🔙 Назад")]
+        ],
+        resize_keyboard=True
+    )
+
+def get_task_done_keyboard(task_ids: list):
+    """Инлайн-клавиатура отметки выполнения задач (номера как в списке задач)"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=f"✅ Выполнена №{number}", callback_data=f"task_done_{task_id}")]
+        for number, task_id in enumerate(task_ids, 1)
+    ])
+
 def get_approval_keyboard():
     """Клавиатура проверки отчетов"""
     return ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text="✅ Принять"), KeyboardButton(text="🔄 Доработка")],
+            [KeyboardButton(text="📦 Принять пакетом")],
             [KeyboardButton(text="🔙 Назад")]
         ],
         resize_keyboard=True
     )
 
-def get_users_keyboard(users: list):
-    """Инлайн-клавиатура для выбора пользователей"""
+def get_users_keyboard(users: list, has_prev: bool = False, has_next: bool = False, searching: bool = False,
+                       selected: set = frozenset(), can_assign: bool = False):
+    """Инлайн-клавиатура для выбора пользователей (одна страница, отмеченные помечены ✅)"""
     keyboard = []
     for user_id, full_name in users:
-        keyboard.append([InlineKeyboardButton(text=full_name, callback_data=f"user_{user_id}")])
+        mark = "✅ " if user_id in selected else ""
+        keyboard.append([InlineKeyboardButton(text=f"{mark}{full_name}", callback_data=f"user_{user_id}")])
+    
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton(text="◀", callback_data=f"users_prev_{users[0][0]}"))
+    if has_next:
+        navigation.append(InlineKeyboardButton(text="▶", callback_data=f"users_next_{users[-1][0]}"))
+    if navigation:
+        keyboard.append(navigation)
+    
+    if searching:
+        search = InlineKeyboardButton(text="✖ Сбросить поиск", callback_data="users_reset")
+    else:
+        search = InlineKeyboardButton(text="🔍 Поиск по имени", callback_data="users_search")
+    keyboard.append([search, InlineKeyboardButton(text="👥 Группы", callback_data="groups")])
+    if can_assign:
+        keyboard.append([InlineKeyboardButton(text="📨 Назначить выбранным", callback_data="assign")])
     keyboard.append([InlineKeyboardButton(text="❌ Отмена", callback_data="cancel")])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
+def get_task_groups_keyboard(selection: dict):
+    """Инлайн-клавиатура выбора групп сотрудников: все или по должности"""
+    everyone = "✅ " if selection.get("selected_all") else ""
+    keyboard = [[InlineKeyboardButton(text=f"{everyone}👥 Все сотрудники", callback_data="group_all")]]
+    
+    chosen = selection.get("selected_positions", ())
+    for index, position in enumerate(selection.get("positions", ())):
+        mark = "✅ " if position in chosen else ""
+        keyboard.append([InlineKeyboardButton(text=f"{mark}{position}", callback_data=f"group_{index}")])
+    
+    keyboard.append([InlineKeyboardButton(text="◀ К списку сотрудников", callback_data="groups_back")])
+    if has_task_selection(selection):
+        keyboard.append([InlineKeyboardButton(text="📨 Назначить выбранным", callback_data="assign")])
+    keyboard.append([InlineKeyboardButton(text="❌ Отмена", callback_data="cancel")])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+def get_bulk_review_keyboard(dates: list, employees: list, total: int, selection: dict):
+    """Инлайн-клавиатура массовой проверки: даты и сотрудники с числом отчетов на проверке"""
+    chosen_dates = selection.get("bulk_dates", ())
+    chosen_users = selection.get("bulk_users", ())
+    keyboard = []
+    for report_date, count in dates:
+        mark = "✅ " if report_date in chosen_dates else ""
+        keyboard.append([InlineKeyboardButton(
+            text=f"{mark}📅 {format_date(report_date)} — {count}", callback_data=f"bulk_d_{report_date}")])
+    for user_id, full_name, count in employees:
+        mark = "✅ " if user_id in chosen_users else ""
+        keyboard.append([InlineKeyboardButton(
+            text=f"{mark}👤 {full_name} — {count}", callback_data=f"bulk_u_{user_id}")])
+    
+    if chosen_dates or chosen_users:
+        keyboard.append([InlineKeyboardButton(text="✅ Принять выбранные", callback_data="bulk_apply")])
+    keyboard.append([InlineKeyboardButton(text=f"✅ Принять все ({total})", callback_data="bulk_all")])
+    keyboard.append([InlineKeyboardButton(text="❌ Отмена", callback_data="bulk_cancel")])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
 # === Инициализация базы данных ===
 async def init_db():
-    """Инициализация таблиц в базе данных"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                full_name TEXT NOT NULL,
-                position TEXT NOT NULL DEFAULT 'Сотрудник',
-                register_date TEXT DEFAULT CURRENT_TIMESTAMP
-            )""")
-        
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS reports (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                full_name TEXT NOT NULL,
-                photo_id TEXT,
-                report_text TEXT,
-                report_date TEXT NOT NULL,
-                status TEXT NOT NULL DEFAULT 'На проверке',
-                FOREIGN KEY (user_id) REFERENCES users(user_id)
-            )""")
-        
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                task_type TEXT NOT NULL,
-                task_text TEXT NOT NULL,
-                task_date TEXT NOT NULL,
-                deadline TEXT,
-                status TEXT NOT NULL DEFAULT 'Новая',
-                FOREIGN KEY (user_id) REFERENCES users(user_id)
-            )""")
-        
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS notifications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                message TEXT NOT NULL,
-                is_read BOOLEAN DEFAULT 0,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(user_id)
-            )""")
-        
-        await db.commit()
+    """Приводит схему базы данных к актуальной версии"""
+    await apply_migrations(database)
 
 # === Команда /start ===
 @dp.message(Command("start", "help"))
@@ -247,11 +726,7 @@ async def start_command(message: types.Message, state: FSMContext):
         return
     
     # Проверка регистрации пользователя
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)) as cursor:
-            user_exists = await cursor.fetchone()
-    
-    if user_exists:
+    if await get_user(user_id):
         await message.answer(
             f"✅ Приветствуем, {full_name}!",
             reply_markup=get_main_keyboard()
@@ -273,29 +748,60 @@ async def process_employee_code(message: types.Message, state: FSMContext):
         user_id = message.from_user.id
         full_name = message.from_user.full_name
         
-        async with aiosqlite.connect(DB_PATH) as db:
-            await db.execute(
-                "INSERT INTO users (user_id, full_name) VALUES (?, ?)",
-                (user_id, full_name)
-            )
-            await db.commit()
+        async with database.write() as db:
+            # Повторный ввод кода уже зарегистрированным сотрудником не меняет его данные
+            async with db.execute(
+                """INSERT INTO users (user_id, full_name, search_name) VALUES (?, ?, ?)
+                ON CONFLICT(user_id) DO NOTHING
+                RETURNING user_id""",
+                (user_id, full_name, full_name.casefold())
+            ) as cursor:
+                registered = await cursor.fetchone() is not None
+            if registered:
+                # Уведомление админам уходит через outbox: обработчик не ждёт рассылки
+                await outbox.enqueue_many(db, admin_messages(f"🆕 Новый сотрудник: {full_name} (ID: {user_id})"))
+        invalidate_users_cache(user_id)
+        outbox_worker.wake()
         
         await message.answer(
             f"✅ Регистрация успешна! Добро пожаловать, {full_name}!",
             reply_markup=get_main_keyboard()
         )
         await state.clear()
-        
-        # Уведомление админам
-        await notify_admins(f"🆕 Новый сотрудник: {full_name} (ID: {user_id})")
     else:
         await message.answer("❌ Неверный код сотрудника. Попробуйте ещё раз.")
 
+# === Антифлуд ===
+@dp.message(Command("throttled"))
+async def show_throttled(message: types.Message):
+    """Показывает админу, кого и на чём ограничивал антифлуд с момента запуска"""
+    if message.from_user.id not in ADMINS:
+        return
+    
+    by_handler = metrics.THROTTLED.values()
+    if not by_handler:
+        await message.answer("✅ С момента запуска антифлуд никого не ограничивал.")
+        return
+    
+    response = f"⏳ Отклонено запросов: {sum(by_handler.values())}\n\nПо действиям:\n"
+    for name, count in sorted(by_handler.items(), key=lambda item: item[1], reverse=True):
+        response += f"• {name}: {count}\n"
+    response += "\nЧаще всех:\n"
+    for user_id, count in throttling.top():
+        response += f"• {await get_user_name(user_id)} (ID: {user_id}): {count}\n"
+    await message.answer(response)
+
 # === Обработка кнопки Назад ===
 @dp.message(F.text == "🔙 Назад")
 async def back_handler(message: types.Message, state: FSMContext):
     """Обработчик кнопки Назад"""
     user_id = message.from_user.id
+    
+    # Отчёт, открытый на проверке, возвращается в общую очередь
+    report_id = (await state.get_data()).get("current_report_id")
+    if report_id and user_id in ADMINS:
+        await release_report(report_id, user_id)
+    
     await state.clear()
     
     if user_id in ADMINS:
@@ -338,35 +844,37 @@ async def receive_report_text(message: types.Message, state: FSMContext):
     report_text = message.text if message.text.lower() != "без описания" else None
     user_id = message.from_user.id
     full_name = message.from_user.full_name
-    today = datetime.now().strftime("%d.%m.%Y")
+    today = datetime.now().strftime(DATE_FORMAT)
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async def save_report(db):
         await db.execute(
             """INSERT INTO reports 
             (user_id, full_name, photo_id, report_text, report_date, status) 
             VALUES (?, ?, ?, ?, ?, ?)""",
             (user_id, full_name, photo_id, report_text, today, "На проверке")
         )
-        await db.commit()
+        await stats.record_report(db, user_id, full_name, today)
+        # Уведомление админам фиксируется вместе с отчётом и уходит через outbox
+        await outbox.enqueue_many(db, admin_messages(f"📥 Новый отчёт от {full_name}\n📅 Дата: {format_date(today)}"))
+    
+    # Отчёты приходят волной в конце смены: одновременные фиксируются одной транзакцией
+    await report_writer.submit(save_report)
+    outbox_worker.wake()
     
     await message.answer(
         "✅ Ваш отчёт сохранён и отправлен на проверку.",
         reply_markup=get_main_keyboard()
     )
     await state.clear()
-    
-    # Уведомление админам
-    await notify_admins(f"📥 Новый отчёт от {full_name}\n📅 Дата: {today}")
 
 # === Просмотр отчетов пользователя ===
 @dp.message(F.text == "📊 Мои Отчеты")
 async def show_user_reports(message: types.Message):
     """Показывает отчеты пользователя за текущую неделю"""
     user_id = message.from_user.id
-    start_date = (datetime.now() - timedelta(days=datetime.now().weekday())).strftime("%d.%m.%Y")
-    end_date = datetime.now().strftime("%d.%m.%Y")
+    start_date, end_date = get_current_week()
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.read() as db:
         async with db.execute(
             """SELECT report_date, report_text, status 
             FROM reports 
@@ -383,7 +891,7 @@ async def show_user_reports(message: types.Message):
     
     response = "📊 Ваши отчёты за текущую неделю:\n\n"
     for report_date, report_text, status in reports:
-        response += f"📅 {report_date}\n"
+        response += f"📅 {format_date(report_date)}\n"
         if report_text:
             response += f"📝 {report_text}\n"
         response += f"🔄 Статус: {status}\n\n"
@@ -395,30 +903,27 @@ async def show_user_reports(message: types.Message):
 async def show_personal_cabinet(message: types.Message):
     """Отображает личный кабинет с статистикой"""
     user_id = message.from_user.id
-    start_date = (datetime.now() - timedelta(days=datetime.now().weekday())).strftime("%d.%m.%Y")
-    end_date = datetime.now().strftime("%d.%m.%Y")
+    start_date, end_date = get_current_week()
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        # Получаем количество отчетов
-        async with db.execute(
-            "SELECT COUNT(*) FROM reports WHERE user_id = ? AND report_date BETWEEN ? AND ?",
-            (user_id, start_date, end_date)
-        ) as cursor:
-            submitted = (await cursor.fetchone())[0]
-        
-        # Получаем информацию о пользователе
+    async with database.read() as db:
+        # Информация о пользователе и готовая статистика за неделю одним запросом
         async with db.execute(
-            "SELECT position, register_date FROM users WHERE user_id = ?",
-            (user_id,)
+            """SELECT u.position, u.register_date,
+                COALESCE(s.submitted, 0), COALESCE(s.accepted, 0), COALESCE(s.in_revision, 0)
+            FROM users u
+            LEFT JOIN user_stats s ON s.user_id = u.user_id AND s.period_start = ?
+            WHERE u.user_id = ?""",
+            (start_date, user_id)
         ) as cursor:
             user_info = await cursor.fetchone()
     
     position = user_info[0] if user_info else "Сотрудник"
     register_date = user_info[1] if user_info else "неизвестно"
+    submitted, accepted, in_revision = user_info[2:] if user_info else (0, 0, 0)
     
     # Рассчитываем пропущенные отчеты
-    start = datetime.strptime(start_date, "%d.%m.%Y")
-    end = datetime.strptime(end_date, "%d.%m.%Y")
+    start = datetime.strptime(start_date, DATE_FORMAT)
+    end = datetime.strptime(end_date, DATE_FORMAT)
     total_days = (end - start).days + 1
     missed = total_days - submitted
     
@@ -428,6 +933,8 @@ async def show_personal_cabinet(message: types.Message):
         f"📅 Дата регистрации: {register_date}\n\n"
         f"📊 Статистика за текущую неделю:\n"
         f"✅ Сдано отчётов: {submitted}\n"
+        f"👍 Принято: {accepted}\n"
+        f"🔄 На доработке: {in_revision}\n"
         f"❌ Пропущено отчётов: {missed}"
     )
     
@@ -439,9 +946,9 @@ async def show_user_tasks(message: types.Message):
     """Показывает задачи пользователя"""
     user_id = message.from_user.id
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with database.read() as db:
         async with db.execute(
-            """SELECT task_type, task_text, task_date, deadline, status 
+            """SELECT id, task_type, task_text, task_date, deadline, status 
             FROM tasks 
             WHERE user_id = ? AND status != 'Завершена'
             ORDER BY task_date DESC""",
@@ -455,14 +962,44 @@ async def show_user_tasks(message: types.Message):
         return
     
     response = "📌 Ваши задачи:\n\n"
-    for task_type, task_text, task_date, deadline, status in tasks:
-        response += f"📅 {task_date}\n"
+    for number, (_, task_type, task_text, task_date, deadline, status) in enumerate(tasks, 1):
+        response += f"№{number} 📅 {format_date(task_date)}\n"
         response += f"📋 {task_type}: {task_text}\n"
         if deadline:
-            response += f"⏳ Срок: {deadline}\n"
+            response += f"⏳ Срок: {deadlines.format_deadline(deadline)}\n"
         response += f"🔄 Статус: {status}\n\n"
     
-    await send_media(message, "tasks", response)
+    await send_media(message, "tasks", response,
+                     reply_markup=get_task_done_keyboard([task[0] for task in tasks]))
+
+@dp.callback_query(F.data.startswith("task_done_"))
+async def complete_task(callback: types.CallbackQuery):
+    """Отмечает задачу сотрудника выполненной"""
+    task_id = int(callback.data.split("_")[2])
+    
+    async with database.write() as db:
+        async with db.execute(
+            """UPDATE tasks SET status = 'Завершена'
+            WHERE id = ? AND user_id = ? AND status != 'Завершена'
+            RETURNING deadline, deadline_stage""",
+            (task_id, callback.from_user.id)
+        ) as cursor:
+            task = await cursor.fetchone()
+    
+    if not task:
+        await callback.answer("Задача уже завершена.")
+        return
+    
+    deadline, deadline_stage = task
+    if deadline and deadline_stage < deadlines.OVERDUE:
+        deadline_scheduler.discard(task_id)
+    
+    # Убираем кнопку выполненной задачи, остальные номера не меняются
+    markup = callback.message.reply_markup
+    if markup:
+        rows = [row for row in markup.inline_keyboard if row[0].callback_data != callback.data]
+        await callback.message.edit_reply_markup(reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
+    await callback.answer("✅ Задача отмечена выполненной.")
 
 # === Мотивация ===
 @dp.message(F.text == "💪 Мотивация")
@@ -487,13 +1024,15 @@ async def show_employee_rating(message: types.Message):
     if message.from_user.id not in ADMINS:
         return
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    start_date, end_date = get_current_week()
+    
+    async with database.read() as db:
         async with db.execute(
-            """SELECT full_name, COUNT(*) as report_count 
-            FROM reports 
-            WHERE report_date BETWEEN date('now', 'weekday 0', '-7 days') AND date('now')
-            GROUP BY user_id 
-            ORDER BY report_count DESC"""
+            """SELECT full_name, submitted 
+            FROM user_stats 
+            WHERE period_start = ? AND submitted > 0
+            ORDER BY submitted DESC""",
+            (start_date,)
         ) as cursor:
             rating = await cursor.fetchall()
     
@@ -508,53 +1047,76 @@ async def show_employee_rating(message: types.Message):
     await message.answer(response)
 
 # Проверка отчетов
+async def claim_next_report(admin_id: int, review_cursor: list = None):
+    """Атомарно закрепляет за админом следующий отчёт на проверке после курсора (дата, id)"""
+    start_date, end_date = get_current_week()
+    last_date, last_id = review_cursor or ("", 0)
+    now = time.time()
+    
+    async with database.write() as db:
+        # Чужие закрепления действуют REVIEW_CLAIM_TTL секунд, затем отчёт снова доступен
+        async with db.execute(
+            """UPDATE reports SET reviewer_id = ?, claimed_at = ?
+            WHERE id = (
+                SELECT id FROM reports
+                WHERE status = 'На проверке'
+                AND report_date BETWEEN ? AND ?
+                AND (report_date, id) > (?, ?)
+                AND (reviewer_id IS NULL OR reviewer_id = ? OR claimed_at < ?)
+                ORDER BY report_date, id
+                LIMIT 1
+            )
+            RETURNING id, full_name, photo_id, report_text, report_date""",
+            (admin_id, now, start_date, end_date, last_date, last_id, admin_id, now - REVIEW_CLAIM_TTL)
+        ) as cursor:
+            return await cursor.fetchone()
+
+async def release_report(report_id: int, admin_id: int):
+    """Снимает закрепление отчёта, если админ вышел из проверки"""
+    async with database.write() as db:
+        await db.execute(
+            "UPDATE reports SET reviewer_id = NULL, claimed_at = NULL WHERE id = ? AND reviewer_id = ?",
+            (report_id, admin_id)
+        )
+
 @dp.message(F.text == "✅ Проверить Отчеты")
 async def start_reports_check(message: types.Message, state: FSMContext):
     """Начинает процесс проверки отчетов"""
     if message.from_user.id not in ADMINS:
         return
     
-    start_date = (datetime.now() - timedelta(days=datetime.now().weekday())).strftime("%d.%m.%Y")
-    end_date = datetime.now().strftime("%d.%m.%Y")
-    
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            """SELECT id, full_name, photo_id, report_text, report_date 
-            FROM reports 
-            WHERE status = 'На проверке' 
-            AND report_date BETWEEN ? AND ?
-            ORDER BY report_date""",
-            (start_date, end_date)
-        ) as cursor:
-            reports = await cursor.fetchall()
+    report = await claim_next_report(message.from_user.id)
     
-    if not reports:
+    if not report:
         await message.answer("📭 Нет отчётов на проверку.")
         return
     
-    await state.update_data(reports=reports, current_report=0)
-    await show_next_report(message, state)
+    await state.update_data(review_cursor=None)
+    await show_report(message, state, report)
 
 async def show_next_report(message: types.Message, state: FSMContext):
     """Показывает следующий отчет для проверки"""
     data = await state.get_data()
-    reports = data.get("reports", [])
-    current_report = data.get("current_report", 0)
+    report = await claim_next_report(message.from_user.id, data.get("review_cursor"))
     
-    if current_report >= len(reports):
+    if not report:
         await message.answer(
             "✅ Все отчеты проверены.",
             reply_markup=get_main_keyboard(is_admin=True))
         await state.clear()
         return
     
-    report_id, full_name, photo_id, report_text, report_date = reports[current_report]
+    await show_report(message, state, report)
+
+async def show_report(message: types.Message, state: FSMContext, report):
+    """Отправляет админу закреплённый за ним отчет"""
+    report_id, full_name, photo_id, report_text, report_date = report
     
-    caption = f"📝 Отчёт от {full_name}\n📅 Дата: {report_date}"
+    caption = f"📝 Отчёт от {full_name}\n📅 Дата: {format_date(report_date)}"
     if report_text:
         caption += f"\n\n{report_text}"
     
-    await state.update_data(current_report_id=report_id)
+    await state.update_data(current_report_id=report_id, current_report_date=report_date)
     
     if photo_id:
         await message.answer_photo(
@@ -566,6 +1128,12 @@ async def show_next_report(message: types.Message, state: FSMContext):
             caption,
             reply_markup=get_approval_keyboard())
 
+async def finish_report(state: FSMContext, data: dict):
+    """Сдвигает курсор проверки за текущий отчет"""
+    await state.update_data(
+        review_cursor=[data.get("current_report_date"), data.get("current_report_id")],
+        current_report_id=None)
+
 # Принятие отчета
 @dp.message(F.text == "✅ Принять")
 async def approve_report(message: types.Message, state: FSMContext):
@@ -577,36 +1145,174 @@ async def approve_report(message: types.Message, state: FSMContext):
         await message.answer("❌ Ошибка: не найден текущий отчет.")
         return
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        # Обновляем статус отчета
-        await db.execute(
-            "UPDATE reports SET status = 'Принят' WHERE id = ?",
-            (report_id,)
-        )
-        
-        # Получаем информацию для уведомления
+    async with database.write() as db:
+        # Обновляем статус отчета, только если его ещё никто не проверил
         async with db.execute(
-            "SELECT user_id, report_date FROM reports WHERE id = ?",
+            """UPDATE reports SET status = 'Принят'
+            WHERE id = ? AND status = 'На проверке'
+            RETURNING user_id, report_date""",
             (report_id,)
         ) as cursor:
-            user_id, report_date = await cursor.fetchone()
+            report = await cursor.fetchone()
         
-        await db.commit()
+        if report:
+            user_id, report_date = report
+            await stats.record_review(db, user_id, report_date, accepted=True)
+            # Уведомление уходит через outbox в той же транзакции
+            await outbox.enqueue(db, user_id, f"✅ Ваш отчёт за {format_date(report_date)} был принят.")
     
-    await message.answer("✅ Отчёт принят.")
+    await finish_report(state, data)
     
-    # Уведомляем сотрудника
-    try:
-        await bot.send_message(
-            user_id,
-            f"✅ Ваш отчёт за {report_date} был принят.")
-    except Exception as e:
-        logger.error(f"Failed to notify user {user_id}: {e}")
+    if report:
+        outbox_worker.wake()
+        await message.answer("✅ Отчёт принят.")
+    else:
+        await message.answer("⚠ Этот отчёт уже проверен другим администратором.")
     
     # Показываем следующий отчет
-    await state.update_data(current_report=data.get("current_report", 0) + 1)
     await show_next_report(message, state)
 
+# Массовое принятие отчетов
+async def get_pending_summary(admin_id: int) -> tuple:
+    """Отчеты на проверке по датам и по сотрудникам (без закреплённых другими админами) и их общее число"""
+    params = (admin_id, time.time() - REVIEW_CLAIM_TTL)
+    async with database.read() as db:
+        async with db.execute(
+            """SELECT report_date, COUNT(*) FROM reports
+            WHERE status = 'На проверке'
+            AND (reviewer_id IS NULL OR reviewer_id = ? OR claimed_at < ?)
+            GROUP BY report_date
+            ORDER BY report_date DESC
+            LIMIT 20""",
+            params
+        ) as cursor:
+            dates = await cursor.fetchall()
+        async with db.execute(
+            """SELECT user_id, MAX(full_name), COUNT(*) AS pending FROM reports
+            WHERE status = 'На проверке'
+            AND (reviewer_id IS NULL OR reviewer_id = ? OR claimed_at < ?)
+            GROUP BY user_id
+            ORDER BY pending DESC
+            LIMIT 20""",
+            params
+        ) as cursor:
+            employees = await cursor.fetchall()
+        async with db.execute(
+            """SELECT COUNT(*) FROM reports
+            WHERE status = 'На проверке'
+            AND (reviewer_id IS NULL OR reviewer_id = ? OR claimed_at < ?)""",
+            params
+        ) as cursor:
+            total = (await cursor.fetchone())[0]
+    return dates, employees, total
+
+async def approve_reports(admin_id: int, dates=(), user_ids=(), everyone: bool = False) -> list:
+    """Принимает все отчеты на проверке за даты или от сотрудников одним UPDATE; возвращает [(user_id, report_date)]"""
+    claim_params = (admin_id, time.time() - REVIEW_CLAIM_TTL)
+    
+    async with database.write() as db:
+        # Отчёты, которые сейчас открыты у другого админа, не трогаем
+        if everyone:
+            query = """UPDATE reports SET status = 'Принят', reviewer_id = NULL, claimed_at = NULL
+                WHERE status = 'На проверке'
+                AND (reviewer_id IS NULL OR reviewer_id = ? OR claimed_at < ?)
+                RETURNING user_id, report_date"""
+            params = claim_params
+        else:
+            query = """UPDATE reports SET status = 'Принят', reviewer_id = NULL, claimed_at = NULL
+                WHERE status = 'На проверке'
+                AND (report_date IN (SELECT value FROM json_each(?)) OR user_id IN (SELECT value FROM json_each(?)))
+                AND (reviewer_id IS NULL OR reviewer_id = ? OR claimed_at < ?)
+                RETURNING user_id, report_date"""
+            params = (json.dumps(list(dates)), json.dumps(list(user_ids))) + claim_params
+        async with db.execute(query, params) as cursor:
+            approved = await cursor.fetchall()
+        
+        await stats.record_reviews(db, approved, accepted=True)
+        
+        # Одно уведомление на сотрудника со всеми его принятыми датами
+        approved_dates = {}
+        for user_id, report_date in approved:
+            approved_dates.setdefault(user_id, set()).add(report_date)
+        notifications = []
+        for user_id, report_dates in approved_dates.items():
+            if len(report_dates) == 1:
+                text = f"✅ Ваш отчёт за {format_date(next(iter(report_dates)))} был принят."
+            else:
+                text = "✅ Приняты ваши отчёты за: " + ", ".join(
+                    format_date(report_date) for report_date in sorted(report_dates)) + "."
+            notifications.append((user_id, text))
+        await outbox.enqueue_many(db, notifications)
+    
+    if approved:
+        outbox_worker.wake()
+        logger.info(f"Admin {admin_id} bulk-approved {len(approved)} reports of {len(approved_dates)} employees")
+    return approved
+
+async def edit_bulk_review(message: types.Message, admin_id: int, selection: dict):
+    """Перерисовывает меню массовой проверки со свежими счётчиками"""
+    dates, employees, total = await get_pending_summary(admin_id)
+    if not total:
+        await message.edit_text("📭 Нет отчётов на проверку.")
+        return
+    await message.edit_text(
+        "📦 Отметьте даты и сотрудников, чьи отчеты нужно принять:",
+        reply_markup=get_bulk_review_keyboard(dates, employees, total, selection))
+
+@dp.message(F.text == "📦 Принять пакетом")
+async def start_bulk_review(message: types.Message, state: FSMContext):
+    """Показывает меню массового принятия отчетов"""
+    if message.from_user.id not in ADMINS:
+        return
+    
+    dates, employees, total = await get_pending_summary(message.from_user.id)
+    if not total:
+        await message.answer("📭 Нет отчётов на проверку.")
+        return
+    
+    selection = await state.update_data(bulk_dates=[], bulk_users=[])
+    await message.answer(
+        "📦 Отметьте даты и сотрудников, чьи отчеты нужно принять:",
+        reply_markup=get_bulk_review_keyboard(dates, employees, total, selection))
+
+@dp.callback_query(F.data.startswith("bulk_"))
+async def process_bulk_review(callback: types.CallbackQuery, state: FSMContext):
+    """Отмечает даты и сотрудников, принимает выбранные отчеты"""
+    admin_id = callback.from_user.id
+    if admin_id not in ADMINS:
+        await callback.answer()
+        return
+    
+    action = callback.data.split("_", 2)
+    data = await state.get_data()
+    
+    if action[1] in ("d", "u"):
+        field = "bulk_dates" if action[1] == "d" else "bulk_users"
+        value = action[2] if action[1] == "d" else int(action[2])
+        chosen = data.get(field, [])
+        chosen = [item for item in chosen if item != value] if value in chosen else chosen + [value]
+        data = await state.update_data({field: chosen})
+        await edit_bulk_review(callback.message, admin_id, data)
+        await callback.answer()
+        return
+    
+    if action[1] == "cancel":
+        await callback.message.edit_text("❌ Массовая проверка отменена.")
+        await callback.answer()
+        return
+    
+    approved = await approve_reports(
+        admin_id,
+        dates=data.get("bulk_dates", ()),
+        user_ids=data.get("bulk_users", ()),
+        everyone=action[1] == "all")
+    await state.update_data(bulk_dates=[], bulk_users=[])
+    
+    employees = len({user_id for user_id, _ in approved})
+    await callback.message.edit_text(
+        f"✅ Принято отчётов: {len(approved)}, уведомлено сотрудников: {employees}.")
+    await callback.answer()
+
 # Отправка на доработку
 @dp.message(F.text == "🔄 Доработка")
 async def request_revision(message: types.Message, state: FSMContext):
@@ -620,6 +1326,7 @@ async def request_revision(message: types.Message, state: FSMContext):
 async def process_revision_reason(message: types.Message, state: FSMContext):
     """Обрабатывает причину доработки"""
     if message.text == "🔙 Назад":
+        await state.set_state(None)
         await show_next_report(message, state)
         return
     
@@ -631,43 +1338,35 @@ async def process_revision_reason(message: types.Message, state: FSMContext):
         await message.answer("❌ Ошибка: не найден текущий отчет.")
         return
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        # Обновляем статус отчета
-        await db.execute(
-            "UPDATE reports SET status = 'На доработке' WHERE id = ?",
-            (report_id,)
-        )
-        
-        # Получаем информацию для уведомления
+    async with database.write() as db:
+        # Обновляем статус отчета, только если его ещё никто не проверил
         async with db.execute(
-            "SELECT user_id, report_date FROM reports WHERE id = ?",
+            """UPDATE reports SET status = 'На доработке'
+            WHERE id = ? AND status = 'На проверке'
+            RETURNING user_id, report_date""",
             (report_id,)
         ) as cursor:
-            user_id, report_date = await cursor.fetchone()
+            report = await cursor.fetchone()
         
-        # Сохраняем уведомление для пользователя
-        await db.execute(
-            """INSERT INTO notifications (user_id, message)
-            VALUES (?, ?)""",
-            (user_id, f"Ваш отчёт за {report_date} требует доработки. Причина: {reason}")
-        )
-        
-        await db.commit()
-    
-    await message.answer(
-        "🔄 Отчёт отправлен на доработку.",
-        reply_markup=get_approval_keyboard())
-    
-    # Уведомляем сотрудника
-    try:
-        await bot.send_message(
-            user_id,
-            f"🔄 Ваш отчёт за {report_date} требует доработки.\nПричина: {reason}")
-    except Exception as e:
-        logger.error(f"Failed to notify user {user_id}: {e}")
+        if report:
+            user_id, report_date = report
+            await stats.record_review(db, user_id, report_date, accepted=False)
+            # Сохраняем уведомление для пользователя
+            await outbox.enqueue(
+                db, user_id, f"🔄 Ваш отчёт за {format_date(report_date)} требует доработки.\nПричина: {reason}")
+    
+    await state.set_state(None)
+    await finish_report(state, data)
+    
+    if report:
+        outbox_worker.wake()
+        await message.answer(
+            "🔄 Отчёт отправлен на доработку.",
+            reply_markup=get_approval_keyboard())
+    else:
+        await message.answer("⚠ Этот отчёт уже проверен другим администратором.")
     
     # Показываем следующий отчет
-    await state.update_data(current_report=data.get("current_report", 0) + 1)
     await show_next_report(message, state)
 
 # Отправка задач
@@ -710,68 +1409,212 @@ async def process_task_text(message: types.Message, state: FSMContext):
         return
     
     await state.update_data(task_text=message.text)
+    await message.answer(
+        f"Введите срок выполнения в формате ДД.ММ.ГГГГ или ДД.ММ.ГГГГ ЧЧ:ММ "
+        f"(без времени — до {DEADLINE_DEFAULT_TIME}):",
+        reply_markup=get_deadline_keyboard())
+    await state.set_state(AdminStates.waiting_task_deadline)
+
+@dp.message(F.text, AdminStates.waiting_task_deadline)
+async def process_task_deadline(message: types.Message, state: FSMContext):
+    """Обрабатывает срок задачи"""
+    if message.text == "🔙 Назад":
+        await message.answer(
+            "Введите текст задачи:",
+            reply_markup=get_back_keyboard())
+        await state.set_state(AdminStates.waiting_task_text)
+        return
     
-    # Получаем список пользователей для назначения задачи
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT user_id, full_name FROM users ORDER BY full_name"
-        ) as cursor:
-            users = await cursor.fetchall()
-    
-    if not users:
+    deadline = None
+    if message.text != "⏭ Без срока":
+        try:
+            deadline = parse_deadline(message.text)
+        except ValueError:
+            await message.answer(
+                "❌ Неверный формат срока. Используйте ДД.ММ.ГГГГ или ДД.ММ.ГГГГ ЧЧ:ММ (например, 31.01.2023 18:00)")
+            return
+        if deadline <= datetime.now().strftime(deadlines.DEADLINE_FORMAT):
+            await message.answer("❌ Срок уже прошёл. Укажите дату и время в будущем:")
+            return
+    
+    selection = await state.update_data(
+        task_deadline=deadline, users_prefix="", users_page=None,
+        selected_users=[], selected_positions=[], selected_all=False)
+    
+    # Первая страница списка пользователей для назначения задачи
+    markup = await get_users_page_markup(selection=selection)
+    
+    if not markup:
         await message.answer("❌ Нет пользователей для назначения задачи.")
         await state.clear()
         return
     
     await message.answer(
-        "Выберите сотрудника для назначения задачи:",
-        reply_markup=get_users_keyboard(users))
+        get_users_page_text(selection=selection),
+        reply_markup=markup)
     await state.set_state(AdminStates.waiting_task_assign)
 
-@dp.callback_query(F.data.startswith("user_"), AdminStates.waiting_task_assign)
-async def assign_task(callback: types.CallbackQuery, state: FSMContext):
-    """Назначает задачу выбранному пользователю"""
-    if callback.data == "cancel":
-        await callback.message.edit_text("❌ Назначение задачи отменено.")
-        await state.clear()
+async def edit_users_page(message: types.Message, data: dict):
+    """Перерисовывает текущую страницу выбора сотрудников"""
+    prefix = data.get("users_prefix", "")
+    cursor, backward = data.get("users_page") or (None, False)
+    markup = await get_users_page_markup(prefix, cursor, backward, data)
+    if markup:
+        await message.edit_text(get_users_page_text(prefix, data), reply_markup=markup)
+
+@dp.callback_query(F.data == "cancel", AdminStates.waiting_task_assign)
+async def cancel_task_assign(callback: types.CallbackQuery, state: FSMContext):
+    """Отменяет назначение задачи"""
+    await callback.message.edit_text("❌ Назначение задачи отменено.")
+    await state.clear()
+
+@dp.callback_query(F.data.startswith("users_"), AdminStates.waiting_task_assign)
+async def page_users(callback: types.CallbackQuery, state: FSMContext):
+    """Листает список сотрудников, включает и сбрасывает поиск"""
+    action = callback.data.split("_")
+    
+    if action[1] == "search":
+        await callback.message.edit_text("🔍 Введите начало имени сотрудника:")
+        await state.set_state(AdminStates.waiting_task_search)
+        await callback.answer()
         return
     
+    if action[1] == "reset":
+        data = await state.update_data(users_prefix="", users_page=None)
+    else:
+        data = await state.update_data(users_page=[int(action[2]), action[1] == "prev"])
+    
+    await edit_users_page(callback.message, data)
+    await callback.answer()
+
+@dp.message(F.text, AdminStates.waiting_task_search)
+async def search_users(message: types.Message, state: FSMContext):
+    """Показывает сотрудников, чьё имя начинается с введённого текста"""
+    prefix = message.text.strip().casefold()
+    data = await state.get_data()
+    markup = await get_users_page_markup(prefix, selection=data)
+    
+    if not markup:
+        await message.answer(f"📭 Сотрудники на «{message.text.strip()}» не найдены. Попробуйте ещё раз:")
+        return
+    
+    data = await state.update_data(users_prefix=prefix, users_page=None)
+    await message.answer(get_users_page_text(prefix, data), reply_markup=markup)
+    await state.set_state(AdminStates.waiting_task_assign)
+
+@dp.callback_query(F.data.startswith("user_"), AdminStates.waiting_task_assign)
+async def toggle_user(callback: types.CallbackQuery, state: FSMContext):
+    """Отмечает сотрудника для назначения задачи или снимает отметку"""
     user_id = int(callback.data.split("_")[1])
+    selected = (await state.get_data()).get("selected_users", [])
+    if user_id in selected:
+        selected = [selected_id for selected_id in selected if selected_id != user_id]
+    else:
+        selected = selected + [user_id]
+    
+    data = await state.update_data(selected_users=selected)
+    await edit_users_page(callback.message, data)
+    await callback.answer()
+
+@dp.callback_query(F.data == "groups", AdminStates.waiting_task_assign)
+async def show_task_groups(callback: types.CallbackQuery, state: FSMContext):
+    """Показывает группы сотрудников для назначения задачи"""
+    data = await state.update_data(positions=await get_positions())
+    await callback.message.edit_text(
+        "Выберите группы сотрудников:\n" + get_selection_text(data),
+        reply_markup=get_task_groups_keyboard(data))
+    await callback.answer()
+
+@dp.callback_query(F.data.startswith("group_"), AdminStates.waiting_task_assign)
+async def toggle_task_group(callback: types.CallbackQuery, state: FSMContext):
+    """Отмечает группу сотрудников или снимает отметку"""
+    group = callback.data.split("_", 1)[1]
     data = await state.get_data()
-    task_type = data.get("task_type")
-    task_text = data.get("task_text")
-    task_date = datetime.now().strftime("%d.%m.%Y")
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            """INSERT INTO tasks 
-            (user_id, task_type, task_text, task_date, status) 
-            VALUES (?, ?, ?, ?, ?)""",
-            (user_id, task_type, task_text, task_date, "Новая")
-        )
-        
-        # Получаем имя пользователя для уведомления
-        async with db.execute(
-            "SELECT full_name FROM users WHERE user_id = ?",
-            (user_id,)
-        ) as cursor:
-            full_name = (await cursor.fetchone())[0]
-        
-        await db.commit()
+    if group == "all":
+        data = await state.update_data(selected_all=not data.get("selected_all"))
+    else:
+        position = data["positions"][int(group)]
+        chosen = data.get("selected_positions", [])
+        if position in chosen:
+            chosen = [chosen_position for chosen_position in chosen if chosen_position != position]
+        else:
+            chosen = chosen + [position]
+        data = await state.update_data(selected_positions=chosen)
     
     await callback.message.edit_text(
-        f"✅ Задача назначена сотруднику {full_name}.")
+        "Выберите группы сотрудников:\n" + get_selection_text(data),
+        reply_markup=get_task_groups_keyboard(data))
+    await callback.answer()
+
+@dp.callback_query(F.data == "groups_back", AdminStates.waiting_task_assign)
+async def back_to_users_page(callback: types.CallbackQuery, state: FSMContext):
+    """Возвращает к списку сотрудников"""
+    await edit_users_page(callback.message, await state.get_data())
+    await callback.answer()
+
+async def create_tasks(task_type: str, task_text: str, user_ids=(), positions=(), everyone: bool = False,
+                       deadline: str = None) -> list:
+    """Создаёт задачу всем выбранным сотрудникам в одной транзакции; возвращает [(user_id, full_name)]"""
+    task_date = datetime.now().strftime(DATE_FORMAT)
+    notification = (
+        f"📌 Вам назначена новая задача:\n\n"
+        f"Тип: {task_type}\n"
+        f"Описание: {task_text}")
+    if deadline:
+        notification += f"\nСрок: {deadlines.format_deadline(deadline)}"
+    
+    async with database.write() as db:
+        if everyone:
+            query = "SELECT user_id, full_name FROM users -- full scan: задача всем сотрудникам"
+            params = ()
+        else:
+            query = """SELECT user_id, full_name FROM users
+                WHERE user_id IN (SELECT value FROM json_each(?))
+                OR position IN (SELECT value FROM json_each(?))"""
+            params = (json.dumps(list(user_ids)), json.dumps(list(positions), ensure_ascii=False))
+        async with db.execute(query, params) as cursor:
+            recipients = await cursor.fetchall()
+        # RETURNING отдаёт id именно тех задач, что вставил этот запрос
+        async with db.execute(
+            """INSERT INTO tasks 
+            (user_id, task_type, task_text, task_date, deadline, status) 
+            SELECT value, ?, ?, ?, ?, 'Новая' FROM json_each(?)
+            RETURNING id""",
+            (task_type, task_text, task_date, deadline, json.dumps([user_id for user_id, _ in recipients]))
+        ) as cursor:
+            task_ids = [task_id for task_id, in await cursor.fetchall()]
+        # Уведомления уходят через outbox: фоновая рассылка соблюдает лимиты Telegram
+        await outbox.enqueue_many(db, [(user_id, notification) for user_id, _ in recipients])
     
-    # Уведомляем сотрудника
-    try:
-        await bot.send_message(
-            user_id,
-            f"📌 Вам назначена новая задача:\n\n"
-            f"Тип: {task_type}\n"
-            f"Описание: {task_text}")
-    except Exception as e:
-        logger.error(f"Failed to notify user {user_id}: {e}")
+    if recipients:
+        outbox_worker.wake()
+        if deadline:
+            deadline_scheduler.add(task_ids, deadline)
+    return recipients
+
+@dp.callback_query(F.data == "assign", AdminStates.waiting_task_assign)
+async def assign_task(callback: types.CallbackQuery, state: FSMContext):
+    """Назначает задачу всем отмеченным сотрудникам и группам"""
+    data = await state.get_data()
+    recipients = await create_tasks(
+        data.get("task_type"),
+        data.get("task_text"),
+        user_ids=data.get("selected_users", ()),
+        positions=data.get("selected_positions", ()),
+        everyone=data.get("selected_all", False),
+        deadline=data.get("task_deadline"))
+    
+    if not recipients:
+        await callback.answer("Среди выбранных нет сотрудников.", show_alert=True)
+        return
     
+    if len(recipients) == 1:
+        result = f"✅ Задача назначена сотруднику {recipients[0][1]}."
+    else:
+        result = f"✅ Задача назначена сотрудникам: {len(recipients)}."
+    await callback.message.edit_text(result)
+    await callback.answer()
     await state.clear()
 
 # Просмотр отчетов за период
@@ -794,8 +1637,7 @@ async def process_report_period(message: types.Message, state: FSMContext):
         return
     
     if message.text == "📅 Текущая Неделя":
-        start_date = (datetime.now() - timedelta(days=datetime.now().weekday())).strftime("%d.%m.%Y")
-        end_date = datetime.now().strftime("%d.%m.%Y")
+        start_date, end_date = get_current_week()
         await show_reports_for_period(message, start_date, end_date)
         await state.clear()
     elif message.text == "📆 Выбрать Период":
@@ -816,70 +1658,258 @@ async def process_custom_period(message: types.Message, state: FSMContext):
     
     try:
         start_date, end_date = message.text.split("-")
-        datetime.strptime(start_date.strip(), "%d.%m.%Y")
-        datetime.strptime(end_date.strip(), "%d.%m.%Y")
-        await show_reports_for_period(message, start_date.strip(), end_date.strip())
+        await show_reports_for_period(message, parse_display_date(start_date), parse_display_date(end_date))
         await state.clear()
     except ValueError:
         await message.answer(
             "❌ Неверный формат даты. Используйте ДД.ММ.ГГГГ-ДД.ММ.ГГГГ (например, 01.01.2023-31.01.2023)")
 
 async def show_reports_for_period(message: types.Message, start_date: str, end_date: str):
-    """Показывает отчеты за указанный период"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            """SELECT full_name, report_date, report_text, status 
-            FROM reports 
-            WHERE report_date BETWEEN ? AND ?
-            ORDER BY report_date DESC, full_name""",
-            (start_date, end_date)
-        ) as cursor:
-            reports = await cursor.fetchall()
-    
-    if not reports:
+    """Показывает первую страницу отчетов за указанный период (даты в формате хранения)"""
+    page = await get_reports_page(start_date, end_date)
+    if not page:
         await message.answer(
-            f"📭 Нет отчетов за период с {start_date} по {end_date}.")
+            f"📭 Нет отчетов за период с {format_date(start_date)} по {format_date(end_date)}.")
         return
     
-    response = f"📊 Отчеты за период с {start_date} по {end_date}:\n\n"
+    text, markup = page
+    await message.answer(text, reply_markup=markup)
+
+@dp.callback_query(F.data.startswith("period_"))
+async def page_reports(callback: types.CallbackQuery):
+    """Листает отчеты за период в том же сообщении"""
+    if callback.from_user.id not in ADMINS:
+        await callback.answer()
+        return
     
-    current_date = None
-    for full_name, report_date, report_text, status in reports:
-        if report_date != current_date:
-            response += f"\n📅 {report_date}\n"
-            current_date = report_date
-        
-        response += f"👤 {full_name}\n"
-        if report_text:
-            response += f"📝 {report_text}\n"
-        response += f"🔄 {status}\n\n"
+    _, direction, start_date, end_date, cursor = callback.data.split("_")
+    page = await get_reports_page(start_date, end_date, int(cursor), backward=direction == "prev")
+    if page:
+        text, markup = page
+        await callback.message.edit_text(text, reply_markup=markup)
+    await callback.answer()
+
+# Поиск по текстам отчетов
+@dp.message(F.text == "🔍 Поиск Отчетов")
+async def start_report_search(message: types.Message, state: FSMContext):
+    """Начинает поиск по текстам отчетов и именам сотрудников"""
+    if message.from_user.id not in ADMINS:
+        return
     
-    # Разбиваем сообщение на части, если оно слишком длинное
-    if len(response) > 4000:
-        parts = [response[i:i+4000] for i in range(0, len(response), 4000)]
-        for part in parts:
-            await message.answer(part)
-    else:
-        await message.answer(response)
+    await message.answer(
+        "🔍 Введите слова для поиска (клиент, адрес, имя сотрудника):",
+        reply_markup=get_back_keyboard())
+    await state.set_state(AdminStates.waiting_report_search)
+
+@dp.message(Command("search"))
+async def search_command(message: types.Message, state: FSMContext, command: CommandObject):
+    """Поиск по отчетам одной командой: /search текст"""
+    if message.from_user.id not in ADMINS:
+        return
+    
+    if not command.args:
+        await start_report_search(message, state)
+        return
+    await show_search_results(message, state, command.args)
+
+@dp.message(F.text, AdminStates.waiting_report_search)
+async def process_report_search(message: types.Message, state: FSMContext):
+    """Показывает первую страницу найденных отчетов; следующий запрос можно ввести сразу"""
+    if message.text == "🔙 Назад":
+        await back_handler(message, state)
+        return
+    
+    await show_search_results(message, state, message.text)
+
+async def show_search_results(message: types.Message, state: FSMContext, query: str):
+    query = " ".join(query.split())
+    page = await get_search_page(query)
+    if not page:
+        await message.answer(f"📭 По запросу «{query}» ничего не найдено.")
+        return
+    
+    # Запрос хранится в FSM: в callback_data ему не хватит 64 байт
+    await state.update_data(search_query=query)
+    text, markup = page
+    await message.answer(text, reply_markup=markup)
+
+@dp.callback_query(F.data.startswith("search_"))
+async def page_search_results(callback: types.CallbackQuery, state: FSMContext):
+    """Листает результаты поиска в том же сообщении"""
+    if callback.from_user.id not in ADMINS:
+        await callback.answer()
+        return
+    
+    query = (await state.get_data()).get("search_query")
+    page = await get_search_page(query, int(callback.data.split("_")[1])) if query else None
+    if not page:
+        await callback.answer("Поиск устарел, повторите запрос.", show_alert=True)
+        return
+    
+    text, markup = page
+    await callback.message.edit_text(text, reply_markup=markup)
+    await callback.answer()
+
+@dp.callback_query(F.data.startswith("export_"))
+async def export_reports(callback: types.CallbackQuery):
+    """Выгружает отчеты за период одним файлом"""
+    if callback.from_user.id not in ADMINS:
+        await callback.answer()
+        return
+    
+    _, file_format, start_date, end_date = callback.data.split("_")
+    await callback.answer("⏳ Формирую файл...")
+    
+    path, rows = await export.export_reports(database, start_date, end_date, file_format, ARCHIVE_PATH)
+    try:
+        if not rows:
+            await callback.message.answer(
+                f"📭 Нет отчетов за период с {format_date(start_date)} по {format_date(end_date)}.")
+            return
+        await bot.send_document(
+            callback.from_user.id,
+            FSInputFile(path, filename=f"reports_{start_date}_{end_date}.{file_format}"),
+            caption=f"📊 Отчеты за период с {format_date(start_date)} по {format_date(end_date)}: {rows}")
+    finally:
+        os.remove(path)
+
+# === Напоминания ===
+cron_jobs = []
+
+async def remind_missing_reports(spec: str):
+    """Напоминает об отчёте всем, кто не отправил его сегодня; один раз на расписание в день"""
+    today = datetime.now().strftime(DATE_FORMAT)
+    try:
+        queued = await reminders.queue_missing_report_reminders(
+            database,
+            f"{today} {spec}",
+            today,
+            f"⏰ Напоминание: вы ещё не отправили отчёт за {format_date(today)}.")
+    except Exception as e:
+        logger.error(f"Reminder job error: {e}")
+        return
+    if queued:
+        outbox_worker.wake()
+
+# === Архив ===
+async def archive_old_rows():
+    """Переносит старые отчеты и уведомления в архив и отдает освободившееся место файловой системе"""
+    before = (datetime.now() - timedelta(days=ARCHIVE_AFTER_DAYS)).strftime(DATE_FORMAT)
+    try:
+        await archive.archive_reports(database, ARCHIVE_PATH, before, ARCHIVE_BATCH_SIZE)
+        await archive.archive_notifications(database, ARCHIVE_PATH, before, ARCHIVE_BATCH_SIZE)
+        await archive.incremental_vacuum(database)
+    except Exception as e:
+        logger.error(f"Archive job error: {e}")
 
 # === Запуск бота ===
+# Фоновые задачи ведущего воркера; при потере аренды они останавливаются
+leader_tasks = set()
+
+def start_leader_jobs():
+    """Запускает задачи, которые при нескольких воркерах должны выполняться в одном экземпляре"""
+    # Старые даты переводятся в фоне, бот в это время уже отвечает
+    for coro in (convert_legacy_dates(database), search.backfill_search_index(database),
+                 outbox_worker.run(), deadline_scheduler.run()):
+        leader_tasks.add(run_in_background(coro))
+    for spec in REMINDER_CRONS:
+        cron_jobs.append(aiocron.crontab(spec, func=remind_missing_reports, args=(spec,)))
+    if ARCHIVE_CRON:
+        cron_jobs.append(aiocron.crontab(ARCHIVE_CRON, func=archive_old_rows))
+
+def stop_leader_jobs():
+    """Останавливает задачи ведущего: роль перешла к другому воркеру"""
+    for job in cron_jobs:
+        job.stop()
+    cron_jobs.clear()
+    for task in leader_tasks:
+        task.cancel()
+    leader_tasks.clear()
+
 async def on_startup():
     """Действия при запуске бота"""
+    await database.connect()
     await init_db()
-    await notify_admins("🤖 Бот успешно запущен!")
-    logger.info("Bot started")
+    run_in_background(report_writer.run())
+    run_in_background(storage.run_cleanup())
+    if METRICS_PORT:
+        run_in_background(metrics.serve(METRICS_HOST, METRICS_PORT))
+    is_leader = await leader.acquire()
+    if is_leader:
+        start_leader_jobs()
+    run_in_background(leader.run(on_elected=start_leader_jobs, on_lost=stop_leader_jobs))
+    if MEDIA_WARMUP_CHAT_ID:
+        await media_registry.warm_up(bot, MEDIA_WARMUP_CHAT_ID)
+    if WEBHOOK_URL:
+        if not WEBHOOK_SECRET:
+            logger.warning("WEBHOOK_SECRET is not set, webhook requests are not verified")
+        await bot.set_webhook(
+            f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+    # Остальные воркеры стартуют молча, чтобы админы не получали по сообщению от каждого
+    if is_leader:
+        await notify_admins("🤖 Бот успешно запущен!")
+    logger.info(f"Bot started ({'leader' if is_leader else 'follower'} worker {leader.owner})")
 
 async def on_shutdown():
     """Действия при выключении бота"""
-    await notify_admins("⚠ Бот выключается...")
+    if WEBHOOK_URL and WEBHOOK_DELETE_ON_SHUTDOWN:
+        await bot.delete_webhook()
+    if leader.is_leader:
+        await notify_admins("⚠ Бот выключается...")
+    stop_leader_jobs()
+    # База закрывается после фоновых задач: report_writer при отмене дописывает очередь отчётов
+    for task in list(background_tasks):
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await leader.release()
+    await database.close()
+    logger.info(f"User cache: {user_cache.stats()}")
     logger.info("Bot stopped")
 
+def create_webhook_app() -> web.Application:
+    """Создаёт aiohttp-приложение, принимающее обновления от Telegram"""
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=WEBHOOK_SECRET
+    ).register(app, path=WEBHOOK_PATH)
+    return app
+
+async def run_webhook():
+    """Принимает обновления через webhook до остановки процесса"""
+    runner = web.AppRunner(create_webhook_app())
+    await runner.setup()
+    site = web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT, reuse_port=WEBAPP_REUSE_PORT or None)
+    await site.start()
+    logger.info(f"Webhook server listening on {WEBAPP_HOST}:{WEBAPP_PORT}{WEBHOOK_PATH}")
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+    try:
+        await stop_event.wait()
+    finally:
+        await runner.cleanup()
+
 async def main():
     """Основная функция запуска бота"""
     await on_startup()
     
     try:
-        await dp.start_polling(bot)
+        if WEBHOOK_URL:
+            await run_webhook()
+        else:
+            # Webhook мог остаться от запуска в другом режиме
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
     finally:
         await on_shutdown()
 
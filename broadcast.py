@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramRetryAfter,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramServerError,
+)
+
+logger = logging.getLogger(__name__)
+
+# Результаты отправки одного сообщения
+DELIVERED = "delivered"
+FAILED = "failed"
+BLOCKED = "blocked"
+
+
+class TokenBucket:
+    """Ведро токенов с резервированием: ожидающие получают токены по очереди, без гонок"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def reserve(self) -> float:
+        """Забирает токен и возвращает, сколько секунд нужно подождать до его готовности"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(-self.tokens / self.rate, self.paused_until - now, 0.0)
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float):
+        """Останавливает выдачу токенов, например по RetryAfter от Telegram"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def is_idle(self) -> bool:
+        """Ведро полностью восстановилось и его можно не хранить"""
+        now = time.monotonic()
+        return now >= self.paused_until and self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+@dataclass
+class BroadcastResult:
+    """Итог рассылки"""
+    delivered: int = 0
+    failed: int = 0
+    blocked: int = 0
+
+    def add(self, status: str):
+        setattr(self, status, getattr(self, status) + 1)
+
+
+class Broadcaster:
+    """Параллельная рассылка с глобальным и поличатовым ограничением скорости"""
+
+    def __init__(
+        self,
+        bot: Bot,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 3,
+        concurrency: int = 30,
+        max_retries: int = 3,
+    ):
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._chat_buckets = {}
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Восстановившиеся вёдра не нужны: словарь не растёт с числом получателей
+            if len(self._chat_buckets) > 10000:
+                self._chat_buckets = {
+                    key: value for key, value in self._chat_buckets.items() if not value.is_idle()
+                }
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def send(self, chat_id: int, text: str, **kwargs) -> str:
+        """Отправляет одно сообщение с учётом лимитов и повторов; возвращает статус"""
+        attempt = 0
+        while True:
+            await self._chat_bucket(chat_id).acquire()
+            await self.global_bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id, text, **kwargs)
+                return DELIVERED
+            except TelegramRetryAfter as e:
+                # Флуд-контроль не считается попыткой: ждём, сколько попросил Telegram
+                logger.warning(f"Flood control for chat {chat_id}, retry after {e.retry_after}s")
+                self.global_bucket.pause(e.retry_after)
+            except TelegramForbiddenError as e:
+                logger.info(f"Chat {chat_id} blocked the bot: {e}")
+                return BLOCKED
+            except (TelegramNetworkError, TelegramServerError) as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    logger.error(f"Failed to send message to {chat_id}: {e}")
+                    return FAILED
+                await asyncio.sleep(min(2 ** attempt, 30))
+            except Exception as e:
+                logger.error(f"Failed to send message to {chat_id}: {e}")
+                return FAILED
+
+    async def broadcast(self, messages, **kwargs) -> BroadcastResult:
+        """Рассылает пары (chat_id, text) параллельно; память не зависит от числа получателей"""
+        result = BroadcastResult()
+        messages = iter(messages)
+
+        async def worker():
+            for chat_id, text in messages:
+                result.add(await self.send(chat_id, text, **kwargs))
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        if result.failed or result.blocked:
+            logger.info(f"Broadcast finished: {result}")
+        return result
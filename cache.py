@@ -0,0 +1,98 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class _LoadCancelled(Exception):
+    """Загрузку отменили вместе с обработчиком, который её начал"""
+
+
+class TTLCache:
+    """Ограниченный кэш в памяти процесса: записи живут ttl секунд, лишние вытесняются по LRU"""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._loading = {}
+        # Растёт при каждой инвалидации: загрузка, начатая раньше, не кладёт устаревшее значение
+        self._generation = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key, default=MISSING):
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        self._generation += 1
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._generation += 1
+        self._data.clear()
+
+    async def get_or_load(self, key, loader, cache_none: bool = True):
+        """Возвращает значение из кэша или загружает его; одновременные промахи ждут одну загрузку"""
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        future = self._loading.get(key)
+        if future is not None:
+            try:
+                return await asyncio.shield(future)
+            except _LoadCancelled:
+                # Отменили не этого ожидающего, а чужую загрузку: загружаем заново
+                return await self.get_or_load(key, loader, cache_none)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        generation = self._generation
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            # Не cancel(): ожидающие приняли бы чужую отмену за свою
+            future.set_exception(_LoadCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение уже передано ожидающим, повторно не логируем
+            future.exception()
+            raise
+        else:
+            # При cache_none=False None получают только ожидающие этой загрузки, в кэш он не попадает
+            if generation == self._generation and (value is not None or cache_none):
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            del self._loading[key]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
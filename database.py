@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import sys
+import time
+import aiosqlite
+from contextlib import asynccontextmanager
+from metrics import DB_LOCK_WAIT_SECONDS, DB_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Настройки соединений: WAL позволяет читателям не ждать писателя.
+# auto_vacuum действует только на новую базу, существующую переводит python migrations.py vacuum
+PRAGMAS = (
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+CACHED_STATEMENTS = 256
+
+
+def _operation_name() -> str:
+    """Имя функции, взявшей соединение: по нему метрики группируют обращения к БД"""
+    code = sys._getframe(2).f_code
+    return getattr(code, "co_qualname", code.co_name)
+
+
+class Database:
+    """Долгоживущие соединения SQLite: пул читателей и один писатель"""
+
+    def __init__(self, path: str, readers: int = 4):
+        self.path = path
+        self.readers_count = readers
+        self._readers = asyncio.Queue()
+        self._all_readers = []
+        self._writer = None
+        self._write_lock = asyncio.Lock()
+
+    async def _open(self, read_only: bool) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.path, cached_statements=CACHED_STATEMENTS)
+        # SQLite lower() понимает только ASCII, для кириллицы нужен casefold из Python
+        await conn.create_function("casefold", 1, str.casefold, deterministic=True)
+        for pragma in PRAGMAS:
+            await conn.execute(pragma)
+        if read_only:
+            await conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    async def connect(self):
+        """Открывает соединения, вызывается при запуске бота"""
+        # Писатель открывается первым, чтобы переключить файл в режим WAL
+        self._writer = await self._open(read_only=False)
+        for _ in range(self.readers_count):
+            conn = await self._open(read_only=True)
+            self._all_readers.append(conn)
+            self._readers.put_nowait(conn)
+        logger.info(f"Database {self.path} opened with {self.readers_count} readers")
+
+    async def close(self):
+        """Закрывает все соединения, вызывается при остановке бота"""
+        for conn in self._all_readers:
+            await conn.close()
+        self._all_readers.clear()
+        self._readers = asyncio.Queue()
+        if self._writer:
+            async with self._write_lock:
+                await self._writer.close()
+            self._writer = None
+        logger.info(f"Database {self.path} closed")
+
+    def read(self):
+        """Выдаёт соединение для чтения из пула"""
+        return self._read(_operation_name())
+
+    def write(self):
+        """Выдаёт единственное соединение для записи; транзакция фиксируется при выходе"""
+        return self._write(_operation_name())
+
+    @asynccontextmanager
+    async def _read(self, operation: str):
+        conn = await self._readers.get()
+        started = time.perf_counter()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+            DB_SECONDS.observe(operation, time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def _write(self, operation: str):
+        waiting = time.perf_counter()
+        async with self._write_lock:
+            started = time.perf_counter()
+            DB_LOCK_WAIT_SECONDS.observe(operation, started - waiting)
+            try:
+                yield self._writer
+            except BaseException:
+                await self._writer.rollback()
+                raise
+            else:
+                await self._writer.commit()
+            finally:
+                DB_SECONDS.observe(operation, time.perf_counter() - started)
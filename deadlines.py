@@ -0,0 +1,274 @@
+import asyncio
+import heapq
+import json
+import logging
+import time
+from array import array
+from datetime import datetime
+from database import Database
+import outbox
+
+logger = logging.getLogger(__name__)
+
+# Стадии уведомлений о сроке в tasks.deadline_stage
+NOT_NOTIFIED = 0
+REMINDED = 1
+OVERDUE = 2
+
+# Срок хранится как ГГГГ-ММ-ДД ЧЧ:ММ (местное время), показывается как ДД.ММ.ГГГГ ЧЧ:ММ
+DEADLINE_FORMAT = "%Y-%m-%d %H:%M"
+DISPLAY_DEADLINE_FORMAT = "%d.%m.%Y %H:%M"
+# Сколько задач помечается в одной транзакции
+FIRE_BATCH_SIZE = 1000
+LOAD_BATCH_SIZE = 5000
+# Часы могут перевести или машину усыпить: не спим дольше часа, заново сверяясь с вершиной кучи
+MAX_SLEEP = 3600
+RETRY_DELAY = 60
+# Задачи, созданные другими воркерами, подхватываются опросом базы с этим интервалом
+POLL_INTERVAL = 60
+# Сколько задач и сотрудников перечислять в сводке для админов
+SUMMARY_TASKS = 10
+SUMMARY_NAMES = 5
+
+
+def format_deadline(value: str) -> str:
+    """Переводит срок из формата хранения в ДД.ММ.ГГГГ ЧЧ:ММ"""
+    try:
+        return datetime.strptime(value, DEADLINE_FORMAT).strftime(DISPLAY_DEADLINE_FORMAT)
+    except (TypeError, ValueError):
+        return value
+
+
+class DeadlineScheduler:
+    """Уведомления о сроках задач: ближайшее срабатывание берётся из кучи, между срабатываниями задача спит"""
+
+    def __init__(self, database: Database, admins: list, remind_before: float, wake_outbox=None):
+        self.database = database
+        self.admins = admins
+        self.remind_before = remind_before
+        self.wake_outbox = wake_outbox
+        # Куча (время срабатывания, срок, стадия); задачи с одинаковым сроком и стадией — одна запись
+        self._heap = []
+        # (срок, стадия) -> id задач; array хранит id по 8 байт без отдельных объектов int
+        self._groups = {}
+        # Завершённые задачи, чьи записи ещё лежат в куче; выбрасываются при срабатывании
+        self._completed = set()
+        self._changed = asyncio.Event()
+        # Очередь сроков ведёт только запущенный планировщик (ведущий воркер); остальные процессы
+        # ничего не хранят, их задачи находит опрос
+        self._running = False
+        # Задачи с id <= loaded_upto уже загружены; added — более новые, добавленные этим процессом
+        self._loaded_upto = 0
+        self._added = set()
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._groups.values())
+
+    def _push(self, task_ids, deadline: float, stage: int):
+        key = (deadline, stage)
+        ids = self._groups.get(key)
+        if ids is not None:
+            ids.extend(task_ids)
+            return
+        self._groups[key] = array("q", task_ids)
+        fire_at = deadline - self.remind_before if stage == REMINDED else deadline
+        heapq.heappush(self._heap, (fire_at, deadline, stage))
+        # Новое срабатывание раньше, чем то, до которого спит цикл
+        if self._heap[0][1:] == key:
+            self._changed.set()
+
+    def _schedule(self, task_ids, deadline: float, stage: int):
+        """Ставит следующее уведомление задач с учётом уже отправленной стадии"""
+        if stage == NOT_NOTIFIED and deadline - self.remind_before > time.time():
+            self._push(task_ids, deadline, REMINDED)
+        else:
+            self._push(task_ids, deadline, OVERDUE)
+
+    def add(self, task_ids, deadline: str):
+        """Добавляет только что созданные задачи со сроком"""
+        if not self._running:
+            return
+        self._schedule(task_ids, datetime.strptime(deadline, DEADLINE_FORMAT).timestamp(), NOT_NOTIFIED)
+        self._added.update(task_ids)
+
+    def discard(self, task_id: int):
+        """Снимает уведомления о сроке завершённой задачи"""
+        if self._running:
+            self._completed.add(task_id)
+
+    @staticmethod
+    def _group(rows, pending: dict, skip=()):
+        # Задачи, назначенные пакетом, делят один срок: группируем до разбора даты
+        for task_id, deadline, stage in rows:
+            if task_id in skip:
+                continue
+            ids = pending.get((deadline, stage))
+            if ids is None:
+                ids = pending[(deadline, stage)] = array("q")
+            ids.append(task_id)
+
+    def _schedule_groups(self, pending: dict):
+        for (deadline, stage), task_ids in pending.items():
+            try:
+                timestamp = datetime.fromisoformat(deadline).timestamp()
+            except ValueError:
+                logger.warning(f"Tasks {task_ids[:10].tolist()} have invalid deadline {deadline!r}")
+                continue
+            self._schedule(task_ids, timestamp, stage)
+
+    async def load(self):
+        """Загружает сроки всех открытых задач, по которым ещё не отправлено уведомление о просрочке"""
+        self._heap.clear()
+        self._groups.clear()
+        self._completed.clear()
+        self._added.clear()
+        pending = {}
+        async with self.database.read() as db:
+            async with db.execute("SELECT MAX(id) FROM tasks") as cursor:
+                upto = self._loaded_upto = (await cursor.fetchone())[0] or 0
+            async with db.execute(
+                """SELECT id, deadline, deadline_stage FROM tasks
+                WHERE status != 'Завершена' AND deadline_stage < 2 AND deadline IS NOT NULL"""
+            ) as cursor:
+                while rows := await cursor.fetchmany(LOAD_BATCH_SIZE):
+                    # Задачи новее границы, успевшие попасть в выборку, подхватит следующий опрос
+                    self._group((row for row in rows if row[0] <= upto), pending)
+
+        self._schedule_groups(pending)
+        logger.info(f"Deadline scheduler loaded {len(self)} tasks in {len(self._groups)} groups")
+
+    async def _poll(self):
+        """Подхватывает задачи со сроком, созданные после загрузки, в том числе другими воркерами"""
+        # Писатель в SQLite всегда один, поэтому id фиксируются по возрастанию: задача с меньшим id
+        # не появится после того, как граница её прошла
+        async with self.database.read() as db:
+            async with db.execute("SELECT MAX(id) FROM tasks") as cursor:
+                upto = (await cursor.fetchone())[0] or 0
+            async with db.execute(
+                """SELECT id, deadline, deadline_stage FROM tasks
+                WHERE id > ? AND id <= ?
+                AND status != 'Завершена' AND deadline_stage < 2 AND deadline IS NOT NULL""",
+                (self._loaded_upto, upto)
+            ) as cursor:
+                rows = await cursor.fetchall()
+
+        pending = {}
+        self._group(rows, pending, skip=self._added)
+        self._schedule_groups(pending)
+        self._loaded_upto = upto
+        self._added = {task_id for task_id in self._added if task_id > upto}
+        if pending:
+            logger.info(f"Deadline scheduler picked up {sum(len(ids) for ids in pending.values())} new tasks")
+
+    async def _fire(self, deadline: float, stage: int, task_ids: array):
+        live = []
+        for task_id in task_ids:
+            if task_id in self._completed:
+                self._completed.discard(task_id)
+            else:
+                live.append(task_id)
+
+        fired = []
+        for start in range(0, len(live), FIRE_BATCH_SIZE):
+            batch = live[start:start + FIRE_BATCH_SIZE]
+            async with self.database.write() as db:
+                # Стадия меняется вместе с постановкой уведомлений: после перезапуска они не повторятся
+                async with db.execute(
+                    """UPDATE tasks SET deadline_stage = ?
+                    WHERE id IN (SELECT value FROM json_each(?))
+                    AND status != 'Завершена' AND deadline_stage < ?
+                    RETURNING id, user_id, task_text""",
+                    (stage, json.dumps(batch), stage)
+                ) as cursor:
+                    rows = await cursor.fetchall()
+                await outbox.enqueue_many(db, [
+                    (user_id, self._employee_message(task_text, deadline, stage))
+                    for _, user_id, task_text in rows
+                ])
+                if stage == OVERDUE and rows:
+                    summary = await self._overdue_summary(db, rows)
+                    await outbox.enqueue_many(db, [(admin_id, summary) for admin_id in self.admins])
+            if stage == REMINDED and rows:
+                self._push(array("q", (task_id for task_id, _, _ in rows)), deadline, OVERDUE)
+            fired.extend(rows)
+            await asyncio.sleep(0)
+
+        if fired and self.wake_outbox:
+            self.wake_outbox()
+        logger.info(f"Deadline {datetime.fromtimestamp(deadline):%Y-%m-%d %H:%M}: "
+                    f"{'overdue' if stage == OVERDUE else 'reminder'} for {len(fired)} tasks")
+
+    @staticmethod
+    def _employee_message(task_text: str, deadline: float, stage: int) -> str:
+        due = datetime.fromtimestamp(deadline).strftime(DISPLAY_DEADLINE_FORMAT)
+        if stage == REMINDED:
+            return f"⏳ Скоро срок задачи (до {due}):\n\n{task_text}"
+        return f"⏰ Срок задачи истёк ({due}):\n\n{task_text}"
+
+    @staticmethod
+    async def _overdue_summary(db, rows: list) -> str:
+        """Одна сводка для админов на пачку просроченных задач, сгруппированная по тексту задачи"""
+        by_text = {}
+        for _, user_id, task_text in rows:
+            by_text.setdefault(task_text, []).append(user_id)
+        shown = list(by_text.items())[:SUMMARY_TASKS]
+
+        async with db.execute(
+            "SELECT user_id, full_name FROM users WHERE user_id IN (SELECT value FROM json_each(?))",
+            (json.dumps([user_id for _, user_ids in shown for user_id in user_ids[:SUMMARY_NAMES]]),)
+        ) as cursor:
+            names = dict(await cursor.fetchall())
+
+        lines = [f"⏰ Просрочено задач: {len(rows)}"]
+        for task_text, user_ids in shown:
+            line = ", ".join(names.get(user_id, str(user_id)) for user_id in user_ids[:SUMMARY_NAMES])
+            if len(user_ids) > SUMMARY_NAMES:
+                line += f" и ещё {len(user_ids) - SUMMARY_NAMES}"
+            lines.append(f"• {task_text[:100]}: {line}")
+        if len(by_text) > SUMMARY_TASKS:
+            lines.append(f"… и ещё задач: {len(by_text) - SUMMARY_TASKS}")
+        return "\n".join(lines)
+
+    async def run(self):
+        """Основной цикл: спит до ближайшего срабатывания, появления более раннего или опроса базы"""
+        await self.load()
+        self._running = True
+        next_poll = time.monotonic() + POLL_INTERVAL
+        try:
+            while True:
+                self._changed.clear()
+                if time.monotonic() >= next_poll:
+                    try:
+                        await self._poll()
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        logger.error(f"Deadline scheduler poll error: {e}")
+                    next_poll = time.monotonic() + POLL_INTERVAL
+
+                delay = self._heap[0][0] - time.time() if self._heap else MAX_SLEEP
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(
+                            self._changed.wait(), min(delay, MAX_SLEEP, next_poll - time.monotonic()))
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                fire_at, deadline, stage = heapq.heappop(self._heap)
+                task_ids = self._groups.pop((deadline, stage))
+                try:
+                    await self._fire(deadline, stage, task_ids)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Deadline scheduler error: {e}")
+                    # Уведомления не потеряются: стадия в базе не изменилась, повторим позже
+                    ids = self._groups.get((deadline, stage))
+                    if ids is not None:
+                        ids.extend(task_ids)
+                    else:
+                        self._groups[(deadline, stage)] = task_ids
+                        heapq.heappush(self._heap, (time.time() + RETRY_DELAY, deadline, stage))
+        finally:
+            self._running = False
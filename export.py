@@ -0,0 +1,137 @@
+import asyncio
+import csv
+import logging
+import os
+import tempfile
+from datetime import datetime
+import archive
+from database import Database
+
+# openpyxl указан в requirements.txt; без него выгрузка предлагается только в CSV
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_HEADER = ("Дата", "Сотрудник", "Статус", "Текст отчёта")
+FETCH_SIZE = 1000
+FORMATS = ("csv", "xlsx") if openpyxl else ("csv",)
+
+
+def _display_date(value: str) -> str:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%d.%m.%Y")
+    except (TypeError, ValueError):
+        return value
+
+
+def _display_rows(rows: list) -> list:
+    # Строки идут по датам, поэтому дата переводится один раз на день, а не на каждую строку
+    last_date = display_date = None
+    result = []
+    for report_date, full_name, status, report_text, _ in rows:
+        if report_date != last_date:
+            last_date, display_date = report_date, _display_date(report_date)
+        result.append((display_date, full_name, status, report_text or ""))
+    return result
+
+
+async def _fetch_chunk(database: Database, anchor: tuple, end_date: str, archive_path: str = None) -> list:
+    """Читает FETCH_SIZE отчётов после anchor = (report_date, id) и сразу возвращает соединение в пул"""
+    async with database.read() as db:
+        # Граница архива проверяется на каждой пачке: перенос мог начаться посреди выгрузки
+        if not archive_path or not await archive.reaches_archive(db, "reports", anchor[0]):
+            async with db.execute(
+                """SELECT report_date, full_name, status, report_text, id
+                FROM reports
+                WHERE (report_date, id) > (?, ?) AND report_date <= ?
+                ORDER BY report_date, id
+                LIMIT ?""",
+                (*anchor, end_date, FETCH_SIZE)
+            ) as cursor:
+                return await cursor.fetchall()
+
+        # Период уходит в архив: обе таблицы сливаются по индексам (report_date, id) без сортировки
+        async with archive.attached(db, archive_path):
+            async with db.execute(
+                """SELECT report_date, full_name, status, report_text, id
+                FROM main.reports
+                WHERE (report_date, id) > (?, ?) AND report_date <= ?
+                UNION ALL
+                SELECT report_date, full_name, status, report_text, id
+                FROM archive.reports a
+                WHERE (report_date, id) > (?, ?) AND report_date <= ?
+                AND NOT EXISTS (SELECT 1 FROM main.reports m WHERE m.id = a.id)
+                ORDER BY report_date, id
+                LIMIT ?""",
+                (*anchor, end_date, *anchor, end_date, FETCH_SIZE)
+            ) as cursor:
+                return await cursor.fetchall()
+
+
+async def iter_report_chunks(database: Database, start_date: str, end_date: str, archive_path: str = None):
+    """Отдаёт строки отчётов за период пачками по курсору (report_date, id), не занимая читателя между пачками"""
+    anchor = (start_date, 0)
+    while True:
+        rows = await _fetch_chunk(database, anchor, end_date, archive_path)
+        if not rows:
+            break
+        anchor = (rows[-1][0], rows[-1][4])
+        yield _display_rows(rows)
+        if len(rows) < FETCH_SIZE:
+            break
+
+
+async def iter_reports(database: Database, start_date: str, end_date: str, archive_path: str = None):
+    """Отдаёт строки отчётов за период по одной, не загружая весь период в память"""
+    async for rows in iter_report_chunks(database, start_date, end_date, archive_path):
+        for row in rows:
+            yield row
+
+
+def _append_rows(sheet, rows: list):
+    for row in rows:
+        sheet.append(row)
+
+
+async def export_reports(database: Database, start_date: str, end_date: str, file_format: str = "csv",
+                         archive_path: str = None) -> tuple:
+    """Пишет отчёты за период во временный файл; возвращает (путь, число строк). Файл удаляет вызывающий"""
+    if file_format not in FORMATS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+
+    fd, path = tempfile.mkstemp(prefix="reports_", suffix=f".{file_format}")
+    rows = 0
+    sheet = None
+    try:
+        if file_format == "xlsx":
+            # openpyxl сам открывает файл по пути, дескриптор mkstemp ему не нужен
+            os.close(fd)
+            # write_only не держит лист в памяти, строки сразу уходят во временный файл openpyxl.
+            # Сборка и сохранение книги блокируют, поэтому выполняются в потоке, а не в цикле событий
+            workbook = openpyxl.Workbook(write_only=True)
+            sheet = workbook.create_sheet("Отчеты")
+            sheet.append(EXPORT_HEADER)
+            async for chunk in iter_report_chunks(database, start_date, end_date, archive_path):
+                await asyncio.to_thread(_append_rows, sheet, chunk)
+                rows += len(chunk)
+            await asyncio.to_thread(workbook.save, path)
+        else:
+            # utf-8-sig, чтобы Excel корректно открыл кириллицу
+            with open(fd, "w", encoding="utf-8-sig", newline="") as f:
+                writer = csv.writer(f, delimiter=";")
+                writer.writerow(EXPORT_HEADER)
+                async for chunk in iter_report_chunks(database, start_date, end_date, archive_path):
+                    writer.writerows(chunk)
+                    rows += len(chunk)
+    except BaseException:
+        # Лист write_only держит открытым свой временный файл до сохранения книги
+        if sheet is not None and not sheet.closed:
+            sheet.close()
+        os.remove(path)
+        raise
+
+    logger.info(f"Exported {rows} reports for {start_date}..{end_date} to {file_format}")
+    return path, rows
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Mapping
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class SQLiteStorage(BaseStorage):
+    """Хранилище FSM в SQLite: переживает перезапуск, пишет только изменённые поля данных"""
+
+    def __init__(self, database: Database, ttl: float = 86400):
+        self.database = database
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return ":".join(
+            str(part) if part is not None else ""
+            for part in (
+                key.bot_id, key.chat_id, key.user_id,
+                key.thread_id, key.business_connection_id, key.destiny,
+            )
+        )
+
+    def _expires_before(self) -> float:
+        return time.time() - self.ttl
+
+    async def _reset_if_expired(self, db, key: str):
+        """Просроченное, но ещё не удалённое состояние не должно «воскреснуть» при записи"""
+        expires_before = self._expires_before()
+        await db.execute(
+            "DELETE FROM fsm_data WHERE key = ? AND (SELECT updated_at FROM fsm_state WHERE key = ?) < ?",
+            (key, key, expires_before)
+        )
+        await db.execute(
+            "UPDATE fsm_state SET state = NULL WHERE key = ? AND updated_at < ?",
+            (key, expires_before)
+        )
+
+    async def _touch(self, db, key: str):
+        await self._reset_if_expired(db, key)
+        await db.execute(
+            """INSERT INTO fsm_state (key, state, updated_at) VALUES (?, NULL, ?)
+            ON CONFLICT(key) DO UPDATE SET updated_at = excluded.updated_at""",
+            (key, time.time())
+        )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        storage_key = self._key(key)
+        async with self.database.write() as db:
+            await self._reset_if_expired(db, storage_key)
+            await db.execute(
+                """INSERT INTO fsm_state (key, state, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at""",
+                (storage_key, state, time.time())
+            )
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        async with self.database.read() as db:
+            async with db.execute(
+                "SELECT state FROM fsm_state WHERE key = ? AND updated_at >= ?",
+                (self._key(key), self._expires_before())
+            ) as cursor:
+                row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def _read_data(self, db, key: str) -> dict:
+        async with db.execute(
+            """SELECT d.field, d.value
+            FROM fsm_data d
+            JOIN fsm_state s ON s.key = d.key
+            WHERE d.key = ? AND s.updated_at >= ?""",
+            (key, self._expires_before())
+        ) as cursor:
+            return {field: json.loads(value) for field, value in await cursor.fetchall()}
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        async with self.database.read() as db:
+            return await self._read_data(db, self._key(key))
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        storage_key = self._key(key)
+        new = {field: _dumps(value) for field, value in data.items()}
+        async with self.database.write() as db:
+            await self._touch(db, storage_key)
+            async with db.execute(
+                "SELECT field, value FROM fsm_data WHERE key = ?", (storage_key,)
+            ) as cursor:
+                current = dict(await cursor.fetchall())
+
+            removed = [(storage_key, field) for field in current if field not in new]
+            changed = [
+                (storage_key, field, value)
+                for field, value in new.items() if current.get(field) != value
+            ]
+            if removed:
+                await db.executemany("DELETE FROM fsm_data WHERE key = ? AND field = ?", removed)
+            if changed:
+                await db.executemany(
+                    "INSERT OR REPLACE INTO fsm_data (key, field, value) VALUES (?, ?, ?)", changed)
+            if not new:
+                # После state.clear() от пользователя не остаётся ни одной строки
+                await db.execute("DELETE FROM fsm_state WHERE key = ? AND state IS NULL", (storage_key,))
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> dict[str, Any]:
+        """Записывает только переданные поля, не перезаписывая остальные"""
+        storage_key = self._key(key)
+        async with self.database.write() as db:
+            await self._touch(db, storage_key)
+            await db.executemany(
+                "INSERT OR REPLACE INTO fsm_data (key, field, value) VALUES (?, ?, ?)",
+                [(storage_key, field, _dumps(value)) for field, value in data.items()]
+            )
+            return await self._read_data(db, storage_key)
+
+    async def purge_expired(self) -> int:
+        """Удаляет состояния, к которым не обращались дольше TTL"""
+        expires_before = self._expires_before()
+        async with self.database.write() as db:
+            await db.execute(
+                """DELETE FROM fsm_data WHERE key IN (
+                    SELECT key FROM fsm_state WHERE updated_at < ?
+                )""",
+                (expires_before,)
+            )
+            cursor = await db.execute("DELETE FROM fsm_state WHERE updated_at < ?", (expires_before,))
+            purged = cursor.rowcount
+        if purged:
+            logger.info(f"Purged {purged} expired FSM states")
+        return purged
+
+    async def run_cleanup(self, interval: float = 3600):
+        """Периодически удаляет просроченные состояния"""
+        while True:
+            try:
+                await self.purge_expired()
+            except Exception as e:
+                logger.error(f"FSM cleanup error: {e}")
+            await asyncio.sleep(interval)
+
+    async def close(self) -> None:
+        # Соединениями владеет Database, они закрываются в on_shutdown
+        pass
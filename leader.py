@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+    """Аренда роли ведущего в общей базе: при нескольких воркерах фоновые задачи выполняет один"""
+
+    def __init__(self, database: Database, name: str = "bot", ttl: float = 30):
+        self.database = database
+        self.name = name
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+
+    async def acquire(self) -> bool:
+        """Продлевает свою аренду или забирает истёкшую чужую; возвращает, ведущий ли процесс"""
+        now = time.time()
+        async with self.database.write() as db:
+            # При чужой действующей аренде условие WHERE ложно, и RETURNING не вернёт строку
+            async with db.execute(
+                """INSERT INTO leader_lease (name, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    owner = excluded.owner,
+                    expires_at = excluded.expires_at
+                WHERE leader_lease.owner = excluded.owner OR leader_lease.expires_at < ?
+                RETURNING owner""",
+                (self.name, self.owner, now + self.ttl, now)
+            ) as cursor:
+                self.is_leader = await cursor.fetchone() is not None
+        return self.is_leader
+
+    async def release(self):
+        """Отдаёт аренду при остановке, чтобы другой воркер не ждал её истечения"""
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        async with self.database.write() as db:
+            await db.execute("DELETE FROM leader_lease WHERE name = ? AND owner = ?", (self.name, self.owner))
+
+    async def run(self, on_elected, on_lost):
+        """Продлевает аренду каждую треть ttl; вызывает on_elected и on_lost при смене роли"""
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            was_leader = self.is_leader
+            try:
+                await self.acquire()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Аренду не удалось продлить: к её истечению другой воркер вправе стать ведущим
+                logger.error(f"Leader lease error: {e}")
+                self.is_leader = False
+            if self.is_leader and not was_leader:
+                logger.info(f"Worker {self.owner} became the leader")
+                on_elected()
+            elif was_leader and not self.is_leader:
+                logger.warning(f"Worker {self.owner} lost the leader lease")
+                on_lost()
@@ -0,0 +1,82 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись лога — одна строка JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает лишь долю INFO-записей шумных логгеров; предупреждения и ошибки проходят всегда"""
+
+    def __init__(self, rate: float, loggers: tuple):
+        super().__init__()
+        self.rate = rate
+        self.loggers = loggers
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not record.name.startswith(self.loggers):
+            return True
+        if random.random() < self.rate:
+            return True
+        self.dropped += 1
+        return False
+
+
+def setup_logging(
+    path: str = "bot.log",
+    level: str = "INFO",
+    json_format: bool = False,
+    max_bytes: int = 10 * 1024 * 1024,
+    rotate_when: str = None,
+    backups: int = 7,
+    sample_rate: float = 1.0,
+    sampled_loggers: tuple = (),
+) -> QueueListener:
+    """Настраивает логирование: поток событий только кладёт записи в очередь, файл пишет отдельный поток"""
+    formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+
+    if rotate_when:
+        file_handler = TimedRotatingFileHandler(path, when=rotate_when, backupCount=backups, encoding="utf-8")
+    else:
+        file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+    stream_handler = logging.StreamHandler(sys.stderr)
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    if sample_rate < 1 and sampled_loggers:
+        # Отбрасываем до постановки в очередь, чтобы лишние записи ничего не стоили
+        queue_handler.addFilter(SamplingFilter(sample_rate, sampled_loggers))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    # Дописываем очередь в файл при выходе из процесса
+    atexit.register(listener.stop)
+    return listener
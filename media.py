@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from aiogram import Bot, types
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# Ответы Telegram, после которых file_id больше не годится и файл нужно загрузить заново.
+# Остальные ошибки (например, слишком длинная подпись) повторятся и при загрузке
+STALE_FILE_ID_ERRORS = ("wrong file identifier", "wrong remote file identifier", "file reference expired")
+
+
+def is_stale_file_id(error: TelegramBadRequest) -> bool:
+    """Отклонён ли запрос из-за устаревшего file_id"""
+    message = error.message.lower()
+    return any(text in message for text in STALE_FILE_ID_ERRORS)
+
+
+class MediaRegistry:
+    """Реестр file_id медиафайлов: каждый файл загружается в Telegram один раз"""
+
+    def __init__(self, database: Database, media_dir: Path, media_files: dict):
+        self.database = database
+        self.media_dir = media_dir
+        self.media_files = media_files
+        # path -> (mtime_ns, size, content_hash), чтобы не хешировать файл на каждое нажатие
+        self._hashes = {}
+        # path -> (content_hash, file_id)
+        self._file_ids = {}
+        self._locks = {}
+
+    def _content_hash(self, path: Path) -> str:
+        """Возвращает хеш содержимого файла, пересчитывая его только при изменении файла"""
+        stat = path.stat()
+        cached = self._hashes.get(str(path))
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        self._hashes[str(path)] = (stat.st_mtime_ns, stat.st_size, content_hash)
+        return content_hash
+
+    async def _get_file_id(self, path: str, content_hash: str):
+        """Ищет file_id сначала в памяти, затем в БД"""
+        cached = self._file_ids.get(path)
+        if cached and cached[0] == content_hash:
+            return cached[1]
+
+        async with self.database.read() as db:
+            async with db.execute(
+                "SELECT file_id FROM media_cache WHERE path = ? AND content_hash = ?",
+                (path, content_hash)
+            ) as cursor:
+                row = await cursor.fetchone()
+
+        if row:
+            self._file_ids[path] = (content_hash, row[0])
+            return row[0]
+        return None
+
+    async def _store_file_id(self, path: str, content_hash: str, file_id: str):
+        """Сохраняет file_id, полученный после загрузки"""
+        self._file_ids[path] = (content_hash, file_id)
+        async with self.database.write() as db:
+            await db.execute(
+                """INSERT INTO media_cache (path, content_hash, file_id, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(path) DO UPDATE SET
+                    content_hash = excluded.content_hash,
+                    file_id = excluded.file_id,
+                    updated_at = excluded.updated_at""",
+                (path, content_hash, file_id)
+            )
+
+    async def _forget_file_id(self, path: str):
+        """Удаляет устаревший file_id"""
+        self._file_ids.pop(path, None)
+        async with self.database.write() as db:
+            await db.execute("DELETE FROM media_cache WHERE path = ?", (path,))
+
+    def resolve(self, media_key: str):
+        """Возвращает путь к медиафайлу по ключу или None"""
+        media_filename = self.media_files.get(media_key)
+        if not media_filename:
+            return None
+        return self.media_dir / media_filename
+
+    @staticmethod
+    def _extract_file_id(sent: types.Message, is_video: bool) -> str:
+        if is_video:
+            return sent.video.file_id if sent.video else sent.document.file_id
+        return sent.photo[-1].file_id
+
+    async def _send(self, bot: Bot, chat_id: int, media, is_video: bool, **kwargs) -> types.Message:
+        if is_video:
+            return await bot.send_video(chat_id, video=media, supports_streaming=True, **kwargs)
+        return await bot.send_photo(chat_id, photo=media, **kwargs)
+
+    async def send(self, bot: Bot, chat_id: int, media_path: Path, **kwargs) -> types.Message:
+        """Отправляет медиафайл по file_id, загружая его только при первом обращении или изменении"""
+        path = str(media_path)
+        is_video = media_path.suffix == ".mp4"
+        content_hash = await asyncio.to_thread(self._content_hash, media_path)
+
+        file_id = await self._get_file_id(path, content_hash)
+        if file_id:
+            try:
+                return await self._send(bot, chat_id, file_id, is_video, **kwargs)
+            except TelegramBadRequest as e:
+                if not is_stale_file_id(e):
+                    raise
+                logger.warning(f"Stale file_id for {path}, re-uploading: {e}")
+                await self._forget_file_id(path)
+
+        lock = self._locks.setdefault(path, asyncio.Lock())
+        async with lock:
+            # Пока ждали блокировку, файл мог загрузить другой обработчик
+            file_id = await self._get_file_id(path, content_hash)
+            if file_id:
+                return await self._send(bot, chat_id, file_id, is_video, **kwargs)
+
+            sent = await self._send(bot, chat_id, FSInputFile(path=path), is_video, **kwargs)
+            await self._store_file_id(path, content_hash, self._extract_file_id(sent, is_video))
+            logger.info(f"Uploaded media {path}")
+            return sent
+
+    async def warm_up(self, bot: Bot, chat_id: int):
+        """Заранее загружает все медиафайлы в служебный чат, чтобы получить их file_id"""
+        for media_key in self.media_files:
+            media_path = self.resolve(media_key)
+            if not media_path.exists():
+                logger.error(f"Media file not found: {media_path}")
+                continue
+            try:
+                content_hash = await asyncio.to_thread(self._content_hash, media_path)
+                if await self._get_file_id(str(media_path), content_hash):
+                    continue
+                sent = await self.send(bot, chat_id, media_path, disable_notification=True)
+                await bot.delete_message(chat_id, sent.message_id)
+            except Exception as e:
+                logger.error(f"Failed to warm up media {media_key}: {e}")
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм в секундах: от быстрых запросов к SQLite до загрузки видео
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class Counter:
+    """Счётчик с одной меткой"""
+
+    def __init__(self, name: str, documentation: str, label: str):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._values = {}
+
+    def inc(self, label_value: str, amount: int = 1):
+        self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def values(self) -> dict:
+        """Текущее значение по каждому значению метки"""
+        return dict(self._values)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_value, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{{{self.label}=\"{_escape(label_value)}\"}} {value}")
+        return lines
+
+
+class Histogram:
+    """Гистограмма с одной меткой; серия на значение метки создаётся один раз, наблюдение ничего не выделяет"""
+
+    def __init__(self, name: str, documentation: str, label: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = buckets
+        # значение метки -> [число попаданий в каждую корзину..., в +Inf, сумма]
+        self._series = {}
+
+    def observe(self, label_value: str, value: float):
+        series = self._series.get(label_value)
+        if series is None:
+            series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def summary(self) -> dict:
+        """Число наблюдений и сумма по каждому значению метки"""
+        return {
+            label_value: (sum(series[:-1]), series[-1])
+            for label_value, series in self._series.items()
+        }
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_value, series in sorted(self._series.items()):
+            label = f"{self.label}=\"{_escape(label_value)}\""
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                total += count
+                lines.append(f"{self.name}_bucket{{{label},le=\"{bound}\"}} {total}")
+            lines.append(f"{self.name}_sum{{{label}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{label}}} {total}")
+        return lines
+
+
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Handler latency.", "handler")
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Handler exceptions.", "handler")
+DB_SECONDS = Histogram("bot_db_seconds", "Time a database connection is held, by operation.", "operation")
+DB_LOCK_WAIT_SECONDS = Histogram("bot_db_lock_wait_seconds", "Time waiting for the writer connection.", "operation")
+API_SECONDS = Histogram("bot_api_seconds", "Telegram Bot API request latency.", "method")
+API_ERRORS = Counter("bot_api_errors_total", "Failed Telegram Bot API requests.", "method")
+THROTTLED = Counter("bot_throttled_total", "Updates rejected by the antiflood limiter.", "handler")
+
+METRICS = [HANDLER_SECONDS, HANDLER_ERRORS, DB_SECONDS, DB_LOCK_WAIT_SECONDS, API_SECONDS, API_ERRORS, THROTTLED]
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Замеряет время и ошибки каждого обработчика по имени его функции"""
+
+    async def __call__(self, handler, event, data):
+        name = data["handler"].callback.__name__
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(name, time.perf_counter() - started)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Замеряет запросы к Bot API по имени метода"""
+
+    async def __call__(self, make_request, bot, method):
+        name = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            API_ERRORS.inc(name)
+            raise
+        finally:
+            API_SECONDS.observe(name, time.perf_counter() - started)
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        body=render().encode(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+async def serve(host: str, port: int):
+    """HTTP-сервер с /metrics; работает до отмены задачи"""
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+        logger.info(f"Metrics available at http://{host}:{port}/metrics")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,355 @@
+import ast
+import asyncio
+import logging
+import re
+import sqlite3
+import sys
+from os import getenv
+from pathlib import Path
+from dotenv import load_dotenv
+import archive
+from database import Database
+from search import FTS_BACKFILL_UPTO, FTS_FOLD
+from stats import fill_user_stats, rebuild_user_stats
+
+logger = logging.getLogger(__name__)
+
+# Миграции схемы: (версия, описание, шаги). Шаг — SQL-команда или async-функция от соединения.
+# Версия хранится в PRAGMA user_version, новые шаги добавляются только в конец списка
+MIGRATIONS = [
+    (1, "base schema", [
+        """CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            full_name TEXT NOT NULL,
+            position TEXT NOT NULL DEFAULT 'Сотрудник',
+            register_date TEXT DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            full_name TEXT NOT NULL,
+            photo_id TEXT,
+            report_text TEXT,
+            report_date TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'На проверке',
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            task_type TEXT NOT NULL,
+            task_text TEXT NOT NULL,
+            task_date TEXT NOT NULL,
+            deadline TEXT,
+            status TEXT NOT NULL DEFAULT 'Новая',
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            is_read BOOLEAN DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS media_cache (
+            path TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            file_id TEXT NOT NULL,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )""",
+    ]),
+    (2, "period indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_reports_user_date ON reports (user_id, report_date, status)",
+        "CREATE INDEX IF NOT EXISTS idx_reports_date ON reports (report_date, user_id, full_name)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_date ON tasks (user_id, task_date)",
+    ]),
+    (3, "hot path indexes", [
+        """CREATE INDEX IF NOT EXISTS idx_reports_pending
+        ON reports (report_date, id) WHERE status = 'На проверке'""",
+        """CREATE INDEX IF NOT EXISTS idx_tasks_open
+        ON tasks (user_id, task_date) WHERE status != 'Завершена'""",
+        "CREATE INDEX IF NOT EXISTS idx_users_full_name ON users (full_name, user_id)",
+    ]),
+    (4, "notifications outbox", [
+        "ALTER TABLE notifications ADD COLUMN status TEXT NOT NULL DEFAULT 'pending'",
+        "ALTER TABLE notifications ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE notifications ADD COLUMN next_attempt_at REAL NOT NULL DEFAULT 0",
+        # Старые записи уже были отправлены напрямую из обработчиков
+        "UPDATE notifications SET status = 'sent'",
+        """CREATE INDEX IF NOT EXISTS idx_notifications_pending
+        ON notifications (next_attempt_at) WHERE status = 'pending'""",
+    ]),
+    (5, "FSM storage", [
+        """CREATE TABLE IF NOT EXISTS fsm_state (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID""",
+        """CREATE TABLE IF NOT EXISTS fsm_data (
+            key TEXT NOT NULL,
+            field TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (key, field)
+        ) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_fsm_state_updated ON fsm_state (updated_at)",
+    ]),
+    (6, "review claims", [
+        "ALTER TABLE reports ADD COLUMN reviewer_id INTEGER",
+        "ALTER TABLE reports ADD COLUMN claimed_at REAL",
+    ]),
+    (7, "searchable user names", [
+        "ALTER TABLE users ADD COLUMN search_name TEXT NOT NULL DEFAULT ''",
+        "UPDATE users SET search_name = casefold(full_name)",
+        "CREATE INDEX IF NOT EXISTS idx_users_search ON users (search_name, user_id)",
+        "DROP INDEX IF EXISTS idx_users_full_name",
+    ]),
+    (8, "weekly user stats", [
+        """CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER NOT NULL,
+            period_start TEXT NOT NULL,
+            full_name TEXT NOT NULL,
+            submitted INTEGER NOT NULL DEFAULT 0,
+            accepted INTEGER NOT NULL DEFAULT 0,
+            in_revision INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, period_start)
+        ) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_user_stats_rating ON user_stats (period_start, submitted)",
+        fill_user_stats,
+    ]),
+    (9, "period keyset index", [
+        "CREATE INDEX IF NOT EXISTS idx_reports_period ON reports (report_date, id)",
+        "DROP INDEX IF EXISTS idx_reports_date",
+    ]),
+    (10, "position groups", [
+        "CREATE INDEX IF NOT EXISTS idx_users_position ON users (position, user_id)",
+    ]),
+    (11, "pending reports by employee", [
+        """CREATE INDEX IF NOT EXISTS idx_reports_pending_user
+        ON reports (user_id, report_date) WHERE status = 'На проверке'""",
+    ]),
+    (12, "reminder runs", [
+        """CREATE TABLE IF NOT EXISTS reminder_runs (
+            run_key TEXT PRIMARY KEY,
+            started_at REAL NOT NULL,
+            recipients INTEGER
+        )""",
+    ]),
+    (13, "task deadline notifications", [
+        "ALTER TABLE tasks ADD COLUMN deadline_stage INTEGER NOT NULL DEFAULT 0",
+        """CREATE INDEX IF NOT EXISTS idx_tasks_deadline
+        ON tasks (deadline, deadline_stage) WHERE status != 'Завершена' AND deadline_stage < 2""",
+    ]),
+    (14, "report search", [
+        # Внешнее содержимое: индекс не хранит вторую копию текстов, сниппеты берутся из reports
+        """CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+            report_text, full_name,
+            content='reports', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )""",
+        # Отчёты с id <= upto ещё не проиндексированы; их заполняет search.backfill_search_index
+        """CREATE TABLE IF NOT EXISTS search_backfill (
+            table_name TEXT PRIMARY KEY,
+            upto INTEGER NOT NULL
+        )""",
+        "INSERT INTO search_backfill (table_name, upto) SELECT 'reports', COALESCE(MAX(id), 0) FROM reports",
+        f"""CREATE TRIGGER IF NOT EXISTS reports_fts_insert AFTER INSERT ON reports BEGIN
+            INSERT INTO reports_fts (rowid, report_text, full_name)
+            VALUES (new.id, {FTS_FOLD.format("new.report_text")}, {FTS_FOLD.format("new.full_name")});
+        END""",
+        # Ещё не проиндексированные отчёты удалять из индекса нельзя: его содержимое разошлось бы с reports
+        f"""CREATE TRIGGER IF NOT EXISTS reports_fts_delete AFTER DELETE ON reports
+        WHEN old.id > {FTS_BACKFILL_UPTO} BEGIN
+            INSERT INTO reports_fts (reports_fts, rowid, report_text, full_name)
+            VALUES ('delete', old.id, {FTS_FOLD.format("old.report_text")}, {FTS_FOLD.format("old.full_name")});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS reports_fts_update AFTER UPDATE OF report_text, full_name ON reports
+        WHEN old.id > {FTS_BACKFILL_UPTO} BEGIN
+            INSERT INTO reports_fts (reports_fts, rowid, report_text, full_name)
+            VALUES ('delete', old.id, {FTS_FOLD.format("old.report_text")}, {FTS_FOLD.format("old.full_name")});
+            INSERT INTO reports_fts (rowid, report_text, full_name)
+            VALUES (new.id, {FTS_FOLD.format("new.report_text")}, {FTS_FOLD.format("new.full_name")});
+        END""",
+    ]),
+    (15, "report archive", [
+        # Строки раньше archived_before могут лежать в файле архива, а не в рабочей таблице
+        """CREATE TABLE IF NOT EXISTS archive_state (
+            table_name TEXT PRIMARY KEY,
+            archived_before TEXT NOT NULL
+        )""",
+    ]),
+    (16, "leader lease", [
+        # Ведущий воркер, выполняющий фоновые задачи, когда процессов несколько (WEBAPP_REUSE_PORT)
+        """CREATE TABLE IF NOT EXISTS leader_lease (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )""",
+    ]),
+]
+
+
+async def get_schema_version(database: Database) -> int:
+    """Возвращает текущую версию схемы"""
+    async with database.read() as db:
+        async with db.execute("PRAGMA user_version") as cursor:
+            return (await cursor.fetchone())[0]
+
+
+async def apply_migrations(database: Database):
+    """Применяет по порядку все миграции новее текущей версии схемы"""
+    current = await get_schema_version(database)
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        # Каждая миграция выполняется в одной транзакции вместе с обновлением версии.
+        # BEGIN IMMEDIATE сразу берёт блокировку записи, поэтому версию, прочитанную после него,
+        # не изменит другой процесс, запущенный одновременно с этим
+        async with database.write() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            async with db.execute("PRAGMA user_version") as cursor:
+                current = (await cursor.fetchone())[0]
+            if version <= current:
+                await db.rollback()
+                continue
+            for step in statements:
+                if callable(step):
+                    await step(db)
+                else:
+                    await db.execute(step)
+            await db.execute(f"PRAGMA user_version = {version}")
+        logger.info(f"Applied migration {version}: {description}")
+
+
+# Даты в старом формате ДД.ММ.ГГГГ
+LEGACY_DATE_PATTERN = "__.__.____"
+DATE_BATCH_SIZE = 5000
+
+# (таблица, колонка) с датами, которые переводятся в ISO-8601
+DATE_COLUMNS = (
+    ("reports", "report_date"),
+    ("tasks", "task_date"),
+)
+
+
+async def convert_legacy_dates(database: Database, batch_size: int = DATE_BATCH_SIZE) -> int:
+    """Переводит даты ДД.ММ.ГГГГ в ГГГГ-ММ-ДД пакетами, не удерживая писателя надолго"""
+    total = 0
+    for table, column in DATE_COLUMNS:
+        async with database.read() as db:
+            async with db.execute(
+                f"SELECT COUNT(*), MAX(id) FROM {table} WHERE {column} LIKE ?",
+                (LEGACY_DATE_PATTERN,)
+            ) as cursor:
+                pending, max_id = await cursor.fetchone()
+
+        if not pending:
+            continue
+
+        logger.info(f"Converting {pending} legacy dates in {table}.{column}")
+        converted = 0
+        # Идём от новых записей к старым, чтобы текущая неделя стала корректной первой
+        upper = max_id
+        while upper > 0:
+            lower = max(upper - batch_size, 0)
+            async with database.write() as db:
+                cursor = await db.execute(
+                    f"""UPDATE {table}
+                    SET {column} = substr({column}, 7, 4) || '-' || substr({column}, 4, 2) || '-' || substr({column}, 1, 2)
+                    WHERE id > ? AND id <= ? AND {column} LIKE ?""",
+                    (lower, upper, LEGACY_DATE_PATTERN)
+                )
+                converted += cursor.rowcount
+            upper = lower
+            # Отдаём управление обработчикам между пакетами
+            await asyncio.sleep(0)
+
+        logger.info(f"Converted {converted} legacy dates in {table}.{column}")
+        total += converted
+
+    # Статистика строится только по датам в ISO-формате, поэтому после перевода её нужно пересчитать
+    if total:
+        await rebuild_user_stats(database)
+    return total
+
+
+# === Проверка планов запросов ===
+FULL_SCAN_MARKER = "-- full scan"
+SQL_QUERY = re.compile(r"^(SELECT|INSERT|UPDATE|DELETE|WITH)\s", re.IGNORECASE)
+
+
+def find_queries(path: Path) -> list:
+    """Находит SQL-запросы среди строковых литералов модуля"""
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    # Части f-строк не являются самостоятельными запросами
+    fstring_parts = {
+        id(value)
+        for node in ast.walk(tree) if isinstance(node, ast.JoinedStr)
+        for value in node.values
+    }
+    queries = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Constant) or not isinstance(node.value, str):
+            continue
+        if id(node) in fstring_parts:
+            continue
+        sql = node.value.strip()
+        if SQL_QUERY.match(sql):
+            queries.append((node.lineno, sql))
+    return sorted(queries)
+
+
+async def explain_queries(database: Database, paths: list) -> int:
+    """Печатает EXPLAIN QUERY PLAN для каждого запроса и возвращает число полных сканирований"""
+    scans = 0
+    # Запросы к архиву разбираются на его пустой схеме в памяти; создать её может только писатель
+    async with database.write() as db, archive.attached(db, ":memory:"):
+        await archive.create_schema(db)
+        for path in paths:
+            for lineno, sql in find_queries(path):
+                print(f"{path.name}:{lineno}: {' '.join(sql.split())}")
+                params = (None,) * sql.count("?")
+                try:
+                    async with db.execute(f"EXPLAIN QUERY PLAN {sql}", params) as cursor:
+                        plan = [row[3] for row in await cursor.fetchall()]
+                except sqlite3.Error as e:
+                    print(f"    ✗ {e}")
+                    continue
+                # Пометка в тексте запроса разрешает осознанный полный обход (пересчёты, обслуживание)
+                scan_expected = FULL_SCAN_MARKER in sql
+                for detail in plan:
+                    is_scan = detail.startswith("SCAN ") and "INDEX" not in detail and not scan_expected
+                    scans += is_scan
+                    print(f"    {'⚠ ' if is_scan else ''}{detail}")
+    return scans
+
+
+async def main(command: str):
+    load_dotenv()
+    database = Database(getenv("DB_PATH", "reports.db"), readers=1)
+    await database.connect()
+    try:
+        await apply_migrations(database)
+        if command == "rebuild-stats":
+            await rebuild_user_stats(database)
+        elif command == "explain":
+            # Сами миграции намеренно обходят таблицы целиком
+            paths = sorted(p for p in Path(__file__).parent.glob("*.py") if p.name != "migrations.py")
+            scans = await explain_queries(database, paths)
+            print(f"\nFull table scans: {scans}")
+            return 1 if scans else 0
+        elif command == "vacuum":
+            # Однократно для базы, созданной до auto_vacuum: VACUUM переписывает весь файл, бот лучше остановить
+            async with database.write() as db:
+                await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                await db.execute("VACUUM")
+            logger.info("Database vacuumed, auto_vacuum is incremental")
+        return 0
+    finally:
+        await database.close()
+
+
+if __name__ == "__main__":
+    # python migrations.py [migrate|explain|rebuild-stats|vacuum]
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "migrate")))
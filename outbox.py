@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+import aiosqlite
+from broadcast import Broadcaster, DELIVERED, BLOCKED
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# Статусы уведомлений в таблице notifications
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+
+async def enqueue(db: aiosqlite.Connection, user_id: int, message: str):
+    """Ставит уведомление в очередь в рамках текущей транзакции обработчика"""
+    await db.execute(
+        "INSERT INTO notifications (user_id, message, status, next_attempt_at) VALUES (?, ?, ?, ?)",
+        (user_id, message, PENDING, time.time())
+    )
+
+
+async def enqueue_many(db: aiosqlite.Connection, messages):
+    """Ставит пачку уведомлений (user_id, текст) в очередь одним executemany"""
+    now = time.time()
+    await db.executemany(
+        "INSERT INTO notifications (user_id, message, status, next_attempt_at) VALUES (?, ?, ?, ?)",
+        [(user_id, message, PENDING, now) for user_id, message in messages]
+    )
+
+
+class OutboxWorker:
+    """Фоновая доставка уведомлений из таблицы notifications"""
+
+    def __init__(
+        self,
+        database: Database,
+        broadcaster: Broadcaster,
+        batch_size: int = 100,
+        poll_interval: float = 5,
+        max_attempts: int = 5,
+        claim_lease: float = 300,
+    ):
+        self.database = database
+        self.broadcaster = broadcaster
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.claim_lease = claim_lease
+        self._wakeup = asyncio.Event()
+
+    def wake(self):
+        """Будит воркер сразу после фиксации новых уведомлений"""
+        self._wakeup.set()
+
+    async def _claim_due(self) -> list:
+        """Забирает готовые уведомления, сдвигая им next_attempt_at на claim_lease секунд вперёд"""
+        # Выборка и захват — одна команда: другой процесс не получит те же строки. Если процесс упадёт
+        # до конца доставки, строки снова станут готовыми по истечении аренды
+        now = time.time()
+        async with self.database.write() as db:
+            async with db.execute(
+                """UPDATE notifications SET next_attempt_at = ?
+                WHERE id IN (
+                    SELECT id FROM notifications
+                    WHERE status = 'pending' AND next_attempt_at <= ?
+                    ORDER BY next_attempt_at
+                    LIMIT ?
+                )
+                RETURNING id, user_id, message, attempts""",
+                (now + self.claim_lease, now, self.batch_size)
+            ) as cursor:
+                return await cursor.fetchall()
+
+    async def _deliver(self, batch: list):
+        statuses = await asyncio.gather(
+            *(self.broadcaster.send(user_id, message) for _, user_id, message, _ in batch)
+        )
+
+        sent, failed, retry = [], [], []
+        now = time.time()
+        for (notification_id, _, _, attempts), status in zip(batch, statuses):
+            attempts += 1
+            if status == DELIVERED:
+                sent.append((attempts, notification_id))
+            elif status == BLOCKED or attempts >= self.max_attempts:
+                failed.append((attempts, notification_id))
+            else:
+                retry.append((attempts, now + min(30 * 2 ** attempts, 3600), notification_id))
+
+        async with self.database.write() as db:
+            await db.executemany(
+                "UPDATE notifications SET status = 'sent', attempts = ? WHERE id = ?", sent)
+            await db.executemany(
+                "UPDATE notifications SET status = 'failed', attempts = ? WHERE id = ?", failed)
+            await db.executemany(
+                "UPDATE notifications SET attempts = ?, next_attempt_at = ? WHERE id = ?", retry)
+
+        if failed or retry:
+            logger.warning(f"Outbox batch: {len(sent)} sent, {len(retry)} to retry, {len(failed)} failed")
+
+    async def run(self):
+        """Основной цикл: забирает готовые уведомления пачками, пока очередь не опустеет"""
+        logger.info("Outbox worker started")
+        while True:
+            # Сбрасываем флаг до выборки, чтобы не потерять пробуждение во время доставки
+            self._wakeup.clear()
+            try:
+                batch = await self._claim_due()
+                if batch:
+                    await self._deliver(batch)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox worker error: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
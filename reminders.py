@@ -0,0 +1,40 @@
+import logging
+import time
+from database import Database
+from outbox import PENDING
+
+logger = logging.getLogger(__name__)
+
+
+async def queue_missing_report_reminders(database: Database, run_key: str, report_date: str, message: str):
+    """Ставит в outbox напоминания сотрудникам без отчёта за день; возвращает их число или None"""
+    async with database.write() as db:
+        # Запуск записывается вместе с напоминаниями: после перезапуска бота рассылка не повторится
+        cursor = await db.execute(
+            "INSERT OR IGNORE INTO reminder_runs (run_key, started_at) VALUES (?, ?)",
+            (run_key, time.time())
+        )
+        if not cursor.rowcount:
+            logger.info(f"Reminder run {run_key} already done, skipping")
+            return None
+
+        # Один проход по сотрудникам; наличие отчёта проверяется по индексу (user_id, report_date)
+        cursor = await db.execute(
+            """INSERT INTO notifications (user_id, message, status, next_attempt_at)
+            SELECT u.user_id, ?, ?, ?
+            FROM users u
+            WHERE NOT EXISTS (
+                SELECT 1 FROM reports r
+                WHERE r.user_id = u.user_id AND r.report_date = ?
+            )
+            -- full scan: напоминание получает каждый сотрудник без отчёта""",
+            (message, PENDING, time.time(), report_date)
+        )
+        queued = cursor.rowcount
+        await db.execute(
+            "UPDATE reminder_runs SET recipients = ? WHERE run_key = ?",
+            (queued, run_key)
+        )
+
+    logger.info(f"Reminder run {run_key}: queued {queued} reminders")
+    return queued
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import re
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# unicode61 не считает «ё» вариантом «е»: приводим обе буквы к «е» при индексации и в запросе
+FTS_FOLD = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+# Граница ещё не проиндексированных отчётов (id <= upto); после заполнения индекса строки нет
+FTS_BACKFILL_UPTO = "COALESCE((SELECT upto FROM search_backfill WHERE table_name = 'reports'), 0)"
+BACKFILL_BATCH_SIZE = 5000
+# Слова короче двух букв не ищем: префикс из одной буквы перебирает весь словарь индекса
+MIN_TERM_LENGTH = 2
+MAX_TERMS = 10
+# Сколько самых новых совпадений ранжируется; дальше них поиск не листается
+RANK_WINDOW = 1000
+WORD = re.compile(r"\w+")
+
+
+def build_match_query(text: str):
+    """Строит запрос FTS5 из текста админа: все слова должны встретиться, каждое — как начало слова"""
+    terms = [term for term in WORD.findall(text.replace("ё", "е").replace("Ё", "Е")) if len(term) >= MIN_TERM_LENGTH]
+    if not terms:
+        return None
+    # Кавычки защищают от синтаксиса FTS5 (AND, NEAR, двоеточия) в тексте запроса
+    return " ".join(f'"{term}"*' for term in terms[:MAX_TERMS])
+
+
+async def search_reports(database: Database, match_query: str, offset: int, limit: int) -> list:
+    """Самые релевантные из RANK_WINDOW новейших совпадений: [(id, дата, сотрудник, статус, фрагмент)]"""
+    async with database.read() as db:
+        # bm25 по всем совпадениям частого слова стоит сотни миллисекунд, а новые совпадения
+        # FTS5 перебирает по rowid и останавливается на первых RANK_WINDOW
+        async with db.execute(
+            """SELECT rowid FROM reports_fts
+            WHERE reports_fts MATCH ?
+            ORDER BY rowid DESC
+            LIMIT 1 OFFSET ?""",
+            (match_query, RANK_WINDOW - 1)
+        ) as cursor:
+            row = await cursor.fetchone()
+        oldest = row[0] if row else 0
+
+        async with db.execute(
+            """SELECT r.id, r.report_date, r.full_name, r.status,
+                snippet(reports_fts, 0, '«', '»', '…', 12)
+            FROM reports_fts
+            JOIN reports r ON r.id = reports_fts.rowid
+            WHERE reports_fts MATCH ? AND reports_fts.rowid >= ?
+            ORDER BY rank
+            LIMIT ? OFFSET ?""",
+            (match_query, oldest, limit, offset)
+        ) as cursor:
+            return await cursor.fetchall()
+
+
+async def backfill_search_index(database: Database, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Индексирует отчёты, созданные до появления поиска, пакетами от новых к старым"""
+    total = 0
+    while True:
+        async with database.write() as db:
+            async with db.execute("SELECT upto FROM search_backfill WHERE table_name = 'reports'") as cursor:
+                row = await cursor.fetchone()
+            if not row:
+                break
+            upper = row[0]
+            if upper <= 0:
+                await db.execute("DELETE FROM search_backfill WHERE table_name = 'reports'")
+                logger.info(f"Search index backfill finished: {total} reports")
+                break
+
+            lower = max(upper - batch_size, 0)
+            # Граница сдвигается в той же транзакции: прерванное заполнение продолжится с места остановки
+            cursor = await db.execute(
+                f"""INSERT INTO reports_fts (rowid, report_text, full_name)
+                SELECT id, {FTS_FOLD.format("report_text")}, {FTS_FOLD.format("full_name")}
+                FROM reports WHERE id > ? AND id <= ?""",
+                (lower, upper)
+            )
+            total += cursor.rowcount
+            await db.execute("UPDATE search_backfill SET upto = ? WHERE table_name = 'reports'", (lower,))
+        # Отдаём управление обработчикам между пакетами
+        await asyncio.sleep(0)
+    return total
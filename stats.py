@@ -0,0 +1,69 @@
+import logging
+import aiosqlite
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# Неделя отчёта (понедельник) вычисляется из его даты в формате ГГГГ-ММ-ДД
+WEEK_START_SQL = "date(?, 'weekday 0', '-6 days')"
+
+
+async def record_report(db: aiosqlite.Connection, user_id: int, full_name: str, report_date: str):
+    """Учитывает новый отчёт в статистике; вызывается в транзакции вставки отчёта"""
+    await db.execute(
+        f"""INSERT INTO user_stats (user_id, period_start, full_name, submitted)
+        VALUES (?, {WEEK_START_SQL}, ?, 1)
+        ON CONFLICT(user_id, period_start) DO UPDATE SET
+            submitted = submitted + 1,
+            full_name = excluded.full_name""",
+        (user_id, report_date, full_name)
+    )
+
+
+async def record_review(db: aiosqlite.Connection, user_id: int, report_date: str, accepted: bool):
+    """Учитывает результат проверки; вызывается в транзакции смены статуса отчёта"""
+    column = "accepted" if accepted else "in_revision"
+    await db.execute(
+        f"UPDATE user_stats SET {column} = {column} + 1 WHERE user_id = ? AND period_start = {WEEK_START_SQL}",
+        (user_id, report_date)
+    )
+
+
+async def record_reviews(db: aiosqlite.Connection, reviews, accepted: bool):
+    """Учитывает пачку проверок [(user_id, report_date)] одним executemany"""
+    counts = {}
+    for user_id, report_date in reviews:
+        counts[(user_id, report_date)] = counts.get((user_id, report_date), 0) + 1
+    column = "accepted" if accepted else "in_revision"
+    await db.executemany(
+        f"UPDATE user_stats SET {column} = {column} + ? WHERE user_id = ? AND period_start = {WEEK_START_SQL}",
+        [(count, user_id, report_date) for (user_id, report_date), count in counts.items()]
+    )
+
+
+async def fill_user_stats(db: aiosqlite.Connection) -> int:
+    """Заполняет пустую таблицу статистики по reports в текущей транзакции"""
+    cursor = await db.execute(
+        """INSERT INTO user_stats (user_id, period_start, full_name, submitted, accepted, in_revision)
+        SELECT
+            user_id,
+            date(report_date, 'weekday 0', '-6 days') AS period_start,
+            MAX(full_name),
+            COUNT(*),
+            SUM(status = 'Принят'),
+            SUM(status = 'На доработке')
+        FROM reports
+        WHERE date(report_date) IS NOT NULL
+        GROUP BY user_id, period_start
+        -- full scan: пересчёт по всем отчётам"""
+    )
+    return cursor.rowcount
+
+
+async def rebuild_user_stats(database: Database) -> int:
+    """Пересчитывает статистику по таблице reports целиком (первичное заполнение и сверка)"""
+    async with database.write() as db:
+        await db.execute("DELETE FROM user_stats")
+        rows = await fill_user_stats(db)
+    logger.info(f"Rebuilt user stats: {rows} rows")
+    return rows
@@ -0,0 +1,98 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from aiogram import BaseMiddleware, types
+from metrics import THROTTLED
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBuckets:
+    """Корзины токенов по пользователям; полная корзина ничем не отличается от отсутствующей и удаляется"""
+
+    def __init__(self, rate: float, burst: float, maxsize: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        # user_id -> [токены, время обновления, предупреждён ли]; порядок — по времени обновления
+        self._buckets = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _expire(self, now: float):
+        # Корзина, не тронутая burst / rate секунд, снова полна: хранить её незачем
+        horizon = now - self.burst / self.rate
+        while self._buckets:
+            bucket = next(iter(self._buckets.values()))
+            if bucket[1] > horizon and len(self._buckets) < self.maxsize:
+                break
+            self._buckets.popitem(last=False)
+
+    def take(self, user_id: int, cost: float) -> tuple:
+        """Списывает cost токенов; возвращает (разрешено, секунд до разрешения, первый ли отказ подряд)"""
+        now = time.monotonic()
+        self._expire(now)
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = [self.burst, now, False]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(user_id)
+
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            bucket[2] = False
+            return True, 0.0, False
+        first = not bucket[2]
+        bucket[2] = True
+        return False, (cost - bucket[0]) / self.rate, first
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Антифлуд: каждый обработчик стоит токенов, при нехватке вместо обработчика — короткий ответ"""
+
+    def __init__(self, rate: float, burst: float, costs: dict = None, exempt=(), maxsize: int = 10000,
+                 top_size: int = 1000):
+        self.buckets = TokenBuckets(rate, burst, maxsize)
+        self.costs = costs or {}
+        self.exempt = exempt
+        self.top_size = top_size
+        # user_id -> число отказов, не больше top_size записей (алгоритм space-saving):
+        # новый пользователь вытесняет запись с наименьшим счётом и продолжает его,
+        # поэтому счёт может быть завышен, но частые нарушители из таблицы не пропадают
+        self.throttled_users = {}
+
+    def _count(self, user_id: int, handler: str):
+        THROTTLED.inc(handler)
+        count = self.throttled_users.get(user_id)
+        if count is None and len(self.throttled_users) >= self.top_size:
+            evicted = min(self.throttled_users, key=self.throttled_users.get)
+            count = self.throttled_users.pop(evicted)
+        self.throttled_users[user_id] = (count or 0) + 1
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        if user is None or user.id in self.exempt:
+            return await handler(event, data)
+
+        name = data["handler"].callback.__name__
+        allowed, wait, first = self.buckets.take(user.id, self.costs.get(name, 1))
+        if allowed:
+            return await handler(event, data)
+
+        self._count(user.id, name)
+        text = f"⏳ Слишком много запросов. Подождите {math.ceil(wait)} с."
+        if isinstance(event, types.CallbackQuery):
+            # Кнопка иначе «крутится» до таймаута, ответ на callback ничего не стоит
+            await event.answer(text)
+        elif first:
+            logger.info(f"User {user.id} throttled on {name}")
+            await event.answer(text)
+        return None
+
+    def top(self, limit: int = 10) -> list:
+        """Пользователи с наибольшим числом отказов"""
+        return sorted(self.throttled_users.items(), key=lambda item: item[1], reverse=True)[:limit]
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBatcher:
+    """Групповая фиксация: записи обработчиков, пришедшие почти одновременно, идут одной транзакцией"""
+
+    def __init__(self, database: Database, max_delay: float = 0.001, max_batch: int = 200):
+        self.database = database
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._queue = asyncio.Queue()
+        self._stopped = False
+
+    async def submit(self, write):
+        """Выполняет write(db) в общей транзакции и возвращает его результат после фиксации"""
+        if self._stopped:
+            raise RuntimeError("Write batcher is stopped")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((write, future))
+        return await future
+
+    async def _collect(self, batch: list):
+        batch.append(await self._queue.get())
+        # Пока идёт фиксация, очередь копится сама; max_delay ждём, только если уже идёт волна записей,
+        # чтобы одиночная запись не теряла время
+        if self.max_delay and 0 < self._queue.qsize() < self.max_batch - 1:
+            await asyncio.sleep(self.max_delay)
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _commit(self, batch: list):
+        results = []
+        async with self.database.write() as db:
+            for write, _ in batch:
+                results.append(await write(db))
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _commit_one_by_one(self, batch: list):
+        """Запасной путь после ошибки: ошибка одной записи не должна отменять соседние"""
+        for item in batch:
+            try:
+                await self._commit([item])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                future = item[1]
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _flush(self, batch: list):
+        try:
+            await self._commit(batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Write batch of {len(batch)} failed, retrying one by one: {e}")
+            await self._commit_one_by_one(batch)
+
+    @staticmethod
+    def _fail(batch: list, error: Exception):
+        # Не cancel(): иначе ожидающий обработчик примет чужую остановку за свою отмену
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _drain(self, interrupted: list, pending: list):
+        """Остановка: прерванная пачка могла успеть зафиксироваться, поэтому не повторяется,
+        а ещё не начатые записи из очереди фиксируются напоследок"""
+        self._stopped = True
+        self._fail(interrupted, RuntimeError("Write batch interrupted by shutdown"))
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        try:
+            if pending:
+                await self._flush(pending)
+                logger.info(f"Write batcher flushed {len(pending)} queued writes on shutdown")
+        finally:
+            self._fail(pending, RuntimeError("Write batcher is stopped"))
+
+    async def run(self):
+        """Единственный потребитель очереди записей"""
+        logger.info("Write batcher started")
+        batch = []
+        committing = False
+        try:
+            while True:
+                batch = []
+                committing = False
+                await self._collect(batch)
+                committing = True
+                await self._flush(batch)
+        except asyncio.CancelledError:
+            if committing:
+                await self._drain(batch, [])
+            else:
+                await self._drain([], batch)
+            raise